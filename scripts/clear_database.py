@@ -8,14 +8,14 @@ import sys
 import os
 sys.path.append('enhanced')
 
-from enhanced.security_system_v3 import SecuritySystemV3
+from enhanced.security_system_v3 import get_security_system
 
 def clear_database():
     """Очистка базы данных"""
     print("🗑️ Очистка базы данных")
     print("=" * 30)
     
-    security = SecuritySystemV3()
+    security = get_security_system()
     
     # Получаем всех пользователей
     users = security.get_all_users()
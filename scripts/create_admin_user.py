@@ -8,7 +8,7 @@ import sys
 import os
 sys.path.append(os.path.dirname(__file__))
 
-from enhanced.security_system_v3 import security_system
+from enhanced.security_system_v3 import get_security_system
 
 def create_admin():
     """Создание администратора"""
@@ -28,6 +28,8 @@ def create_admin():
         print("❌ Неверный формат Telegram User ID")
         return False
     
+    security_system = get_security_system()
+    
     # Валидируем API ключи
     if not security_system.validate_api_keys(api_key, secret_key, passphrase):
         print("❌ Неверный формат API ключей")
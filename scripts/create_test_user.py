@@ -8,14 +8,14 @@ import sys
 import os
 sys.path.append('enhanced')
 
-from enhanced.security_system_v3 import SecuritySystemV3
+from enhanced.security_system_v3 import get_security_system
 
 def create_test_user():
     """Создание тестового пользователя"""
     print("🔐 Создание тестового пользователя")
     print("=" * 40)
     
-    security = SecuritySystemV3()
+    security = get_security_system()
     
     # Проверяем, есть ли уже пользователи
     users = security.get_all_users()
@@ -8,14 +8,14 @@ import sys
 import os
 sys.path.append('enhanced')
 
-from enhanced.security_system_v3 import SecuritySystemV3
+from enhanced.security_system_v3 import get_security_system
 
 def reset_password():
     """Сброс пароля"""
     print("🔐 Сброс пароля")
     print("=" * 30)
     
-    security = SecuritySystemV3()
+    security = get_security_system()
     
     # Получаем пользователя
     users = security.get_all_users()
@@ -6,10 +6,10 @@ Core modules for Enhanced Trading System
 
 from .auth_system import AuthSystem
 from .flask_auth import FlaskUser, init_flask_auth
-from .security_system_v3 import SecuritySystemV3
+from .security_system_v3 import SecuritySystemV3, get_security_system
 from .config_manager import ConfigManager
 from .security import SecurityManager
 from .log_helper import build_logger, get_logger
 from .exchange_mode_manager import exchange_mode_manager
 
-__all__ = ['AuthSystem', 'FlaskUser', 'init_flask_auth', 'SecuritySystemV3', 'ConfigManager', 'SecurityManager', 'build_logger', 'get_logger', 'exchange_mode_manager']
+__all__ = ['AuthSystem', 'FlaskUser', 'init_flask_auth', 'SecuritySystemV3', 'get_security_system', 'ConfigManager', 'SecurityManager', 'build_logger', 'get_logger', 'exchange_mode_manager']
@@ -8,9 +8,15 @@ Enhanced Trading System v3.0 Commercial
 import os
 import sys
 import importlib
+import importlib.util
 import json
-from typing import Dict, List, Optional, Any, Type
+import threading
+import zipfile
+import zipimport
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Tuple, Type
 from abc import ABC, abstractmethod
+from loguru import logger
 
 class TradingBot(ABC):
     """Базовый класс для торговых ботов"""
@@ -68,127 +74,196 @@ class PluginManager:
     - Новые биржи
     - Новые стратегии
     - Новые индикаторы
+    
+    Модули ботов и бирж могут объявить PLUGIN_CLASS = MyBot, чтобы
+    загрузчик не перебирал все атрибуты модуля.
     """
     
+    _PLUGIN_KINDS = ('bots', 'exchanges', 'strategies', 'indicators')
+    
+    # Каталоги плагинов, уже созданные в этом процессе
+    _DIRS_ENSURED = set()
+    
+    # Базовые классы плагинов; для стратегий и индикаторов регистрируется сам модуль
+    _PLUGIN_BASES = {
+        'bots': TradingBot,
+        'exchanges': Exchange,
+    }
+    
+    _PLUGIN_MESSAGES = {
+        'bots': ("Загружен бот", "Ошибка загрузки бота"),
+        'exchanges': ("Загружена биржа", "Ошибка загрузки биржи"),
+        'strategies': ("Загружена стратегия", "Ошибка загрузки стратегии"),
+        'indicators': ("Загружен индикатор", "Ошибка загрузки индикатора"),
+    }
+    
     def __init__(self, plugins_dir: str = "src/plugins"):
         self.plugins_dir = plugins_dir
         self.bots: Dict[str, Type[TradingBot]] = {}
         self.exchanges: Dict[str, Type[Exchange]] = {}
         self.strategies: Dict[str, Any] = {}
         self.indicators: Dict[str, Any] = {}
+        self._lock = threading.Lock()
         
-        # Создаем папку для плагинов
-        os.makedirs(plugins_dir, exist_ok=True)
-        os.makedirs(f"{plugins_dir}/bots", exist_ok=True)
-        os.makedirs(f"{plugins_dir}/exchanges", exist_ok=True)
-        os.makedirs(f"{plugins_dir}/strategies", exist_ok=True)
-        os.makedirs(f"{plugins_dir}/indicators", exist_ok=True)
+        # Собранный архив плагинов (src/plugins.pyz) загружается вместо каталога
+        self._archive: Optional[str] = None
+        self._archive_names: List[str] = []
+        archive_path = f"{plugins_dir.rstrip('/')}.pyz"
+        if os.path.isfile(archive_path) and hasattr(zipimport.zipimporter, 'find_spec'):
+            self._archive = archive_path
+        
+        # Создаем папки для плагинов (один раз на процесс)
+        if plugins_dir not in PluginManager._DIRS_ENSURED:
+            for kind in self._PLUGIN_KINDS:
+                os.makedirs(f"{plugins_dir}/{kind}", exist_ok=True)
+            PluginManager._DIRS_ENSURED.add(plugins_dir)
         
         # Загружаем плагины
         self.load_plugins()
     
     def load_plugins(self):
         """Загрузка всех плагинов"""
-        self.load_bots()
-        self.load_exchanges()
-        self.load_strategies()
-        self.load_indicators()
+        self._read_archive()
+        
+        jobs = self._collect_all_jobs()
+        
+        if not jobs:
+            return
+        
+        # exec_module каждого плагина независим: чтение и разбор файлов перекрываются
+        max_workers = min(8, os.cpu_count() or 1, len(jobs))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(self._load_one, jobs))
     
-    def load_bots(self):
-        """Загрузка торговых ботов"""
-        bots_dir = f"{self.plugins_dir}/bots"
+    def _read_archive(self):
+        """Чтение списка файлов архива плагинов"""
+        if self._archive is None:
+            return
+        
+        try:
+            with zipfile.ZipFile(self._archive) as archive:
+                self._archive_names = archive.namelist()
+        except Exception as e:
+            logger.error("Ошибка чтения архива плагинов {}: {}", self._archive, e)
+            self._archive = None
+            self._archive_names = []
+    
+    def _collect_all_jobs(self) -> List[Tuple[str, str, str]]:
+        """Сбор файлов плагинов всех типов за один обход каталога"""
+        if self._archive is not None:
+            jobs = []
+            for kind in self._PLUGIN_KINDS:
+                jobs.extend(self._collect_plugin_jobs(kind))
+            return jobs
+        
+        jobs = []
+        root_dir = os.path.normpath(self.plugins_dir)
+        
+        for root, dirnames, filenames in os.walk(root_dir):
+            if root == root_dir:
+                # Спускаемся только в каталоги известных типов плагинов
+                dirnames[:] = [d for d in dirnames if d in self._PLUGIN_KINDS]
+                continue
+            
+            dirnames[:] = []
+            kind = os.path.basename(root)
+            for filename in filenames:
+                if filename.endswith('.py') and not filename.startswith('_'):
+                    jobs.append((kind, filename[:-3], os.path.join(root, filename)))
+        
+        return jobs
+    
+    def _collect_plugin_jobs(self, kind: str) -> List[Tuple[str, str, str]]:
+        """Сбор файлов плагинов одного типа"""
+        plugins_dir = f"{self.plugins_dir}/{kind}"
+        jobs = []
+        
+        if self._archive is not None:
+            # Файлы лежат в архиве как plugins/<kind>/<module>.py
+            prefix = f"{os.path.basename(self.plugins_dir.rstrip('/'))}/{kind}/"
+            for name in self._archive_names:
+                filename = name[len(prefix):]
+                if (name.startswith(prefix) and '/' not in filename and
+                        filename.endswith('.py') and not filename.startswith('_')):
+                    jobs.append((kind, filename[:-3], os.path.join(self._archive, name)))
+            return jobs
         
-        for filename in os.listdir(bots_dir):
-            if filename.endswith('.py') and not filename.startswith('_'):
-                module_name = filename[:-3]
-                try:
-                    spec = importlib.util.spec_from_file_location(
-                        f"plugins.bots.{module_name}",
-                        os.path.join(bots_dir, filename)
-                    )
-                    module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
+        with os.scandir(plugins_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.py') and not entry.name.startswith('_'):
+                    jobs.append((kind, entry.name[:-3], entry.path))
+        
+        return jobs
+    
+    def _build_spec(self, module_name: str, source_path: str):
+        """
+        Создание spec для модуля плагина
+        
+        SourceFileLoader сам берет байткод из __pycache__, если .pyc совпадает
+        с исходником по времени изменения и размеру, иначе компилирует исходник.
+        """
+        if self._archive is not None:
+            return zipimport.zipimporter(os.path.dirname(source_path)).find_spec(module_name)
+        
+        return importlib.util.spec_from_file_location(module_name, source_path)
+    
+    def _load_one(self, job: Tuple[str, str, str]):
+        """Загрузка одного модуля плагина"""
+        kind, module_name, path = job
+        base_cls = self._PLUGIN_BASES.get(kind)
+        loaded_msg, error_msg = self._PLUGIN_MESSAGES[kind]
+        
+        try:
+            spec = self._build_spec(f"plugins.{kind}.{module_name}", path)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            
+            if base_cls is None:
+                # Стратегии и индикаторы регистрируются модулем целиком
+                with self._lock:
+                    getattr(self, kind)[module_name] = module
+                logger.debug("{}: {}", loaded_msg, module_name)
+                return
+            
+            # Плагин может явно указать свой класс через PLUGIN_CLASS
+            plugin_cls = getattr(module, 'PLUGIN_CLASS', None)
+            if plugin_cls is not None:
+                candidates = [plugin_cls]
+            else:
+                # Старые плагины: ищем класс перебором пространства имен модуля
+                candidates = [getattr(module, attr_name) for attr_name in dir(module)]
+            
+            for attr in candidates:
+                if (isinstance(attr, type) and 
+                    issubclass(attr, base_cls) and 
+                    attr != base_cls):
+                    with self._lock:
+                        getattr(self, kind)[module_name] = attr
+                    logger.debug("{}: {}", loaded_msg, module_name)
                     
-                    # Ищем класс бота
-                    for attr_name in dir(module):
-                        attr = getattr(module, attr_name)
-                        if (isinstance(attr, type) and 
-                            issubclass(attr, TradingBot) and 
-                            attr != TradingBot):
-                            self.bots[module_name] = attr
-                            print(f"✅ Загружен бот: {module_name}")
-                            
-                except Exception as e:
-                    print(f"❌ Ошибка загрузки бота {module_name}: {e}")
+        except Exception as e:
+            logger.error("{} {}: {}", error_msg, module_name, e)
+    
+    def _load_kind(self, kind: str):
+        """Последовательная загрузка плагинов одного типа"""
+        for job in self._collect_plugin_jobs(kind):
+            self._load_one(job)
+    
+    def load_bots(self):
+        """Загрузка торговых ботов"""
+        self._load_kind('bots')
     
     def load_exchanges(self):
         """Загрузка бирж"""
-        exchanges_dir = f"{self.plugins_dir}/exchanges"
-        
-        for filename in os.listdir(exchanges_dir):
-            if filename.endswith('.py') and not filename.startswith('_'):
-                module_name = filename[:-3]
-                try:
-                    spec = importlib.util.spec_from_file_location(
-                        f"plugins.exchanges.{module_name}",
-                        os.path.join(exchanges_dir, filename)
-                    )
-                    module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
-                    
-                    # Ищем класс биржи
-                    for attr_name in dir(module):
-                        attr = getattr(module, attr_name)
-                        if (isinstance(attr, type) and 
-                            issubclass(attr, Exchange) and 
-                            attr != Exchange):
-                            self.exchanges[module_name] = attr
-                            print(f"✅ Загружена биржа: {module_name}")
-                            
-                except Exception as e:
-                    print(f"❌ Ошибка загрузки биржи {module_name}: {e}")
+        self._load_kind('exchanges')
     
     def load_strategies(self):
         """Загрузка стратегий"""
-        strategies_dir = f"{self.plugins_dir}/strategies"
-        
-        for filename in os.listdir(strategies_dir):
-            if filename.endswith('.py') and not filename.startswith('_'):
-                module_name = filename[:-3]
-                try:
-                    spec = importlib.util.spec_from_file_location(
-                        f"plugins.strategies.{module_name}",
-                        os.path.join(strategies_dir, filename)
-                    )
-                    module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
-                    
-                    self.strategies[module_name] = module
-                    print(f"✅ Загружена стратегия: {module_name}")
-                    
-                except Exception as e:
-                    print(f"❌ Ошибка загрузки стратегии {module_name}: {e}")
+        self._load_kind('strategies')
     
     def load_indicators(self):
         """Загрузка индикаторов"""
-        indicators_dir = f"{self.plugins_dir}/indicators"
-        
-        for filename in os.listdir(indicators_dir):
-            if filename.endswith('.py') and not filename.startswith('_'):
-                module_name = filename[:-3]
-                try:
-                    spec = importlib.util.spec_from_file_location(
-                        f"plugins.indicators.{module_name}",
-                        os.path.join(indicators_dir, filename)
-                    )
-                    module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
-                    
-                    self.indicators[module_name] = module
-                    print(f"✅ Загружен индикатор: {module_name}")
-                    
-                except Exception as e:
-                    print(f"❌ Ошибка загрузки индикатора {module_name}: {e}")
+        self._load_kind('indicators')
     
     def create_bot(self, bot_type: str, config: Dict[str, Any]) -> Optional[TradingBot]:
         """Создание экземпляра бота"""
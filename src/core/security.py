@@ -6,18 +6,76 @@ Enhanced Trading System v3.0 Commercial
 """
 
 import os
+import base64
+import hmac
 import hashlib
 import secrets
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, Any, Optional
+from cryptography.fernet import Fernet
 from loguru import logger
 
+# Мастер-ключи, уже прочитанные с диска, по пути к файлу
+_MASTER_KEY_CACHE: Dict[str, bytes] = {}
+_MASTER_KEY_LOCK = threading.Lock()
+
+
+# Успешные проверки паролей: (сохраненный хеш, HMAC пароля) -> None.
+# Пароль в открытом виде в кеш не попадает; ключ HMAC живет только в памяти процесса
+_VERIFIED_CACHE: 'OrderedDict[tuple, None]' = OrderedDict()
+_VERIFIED_CACHE_SIZE = 1024
+_VERIFIED_CACHE_KEY = secrets.token_bytes(32)
+_VERIFIED_CACHE_LOCK = threading.Lock()
+
+
+def _pbkdf2(password_bytes: bytes, salt_bytes: bytes) -> bytes:
+    """PBKDF2-HMAC-SHA256 (устаревший формат хешей)"""
+    return hashlib.pbkdf2_hmac('sha256', password_bytes, salt_bytes, 100000)
+
+
+def _scrypt(password_bytes: bytes, salt_bytes: bytes) -> bytes:
+    """scrypt (n=2**15, r=8, p=1)"""
+    return hashlib.scrypt(password_bytes, salt=salt_bytes, n=2 ** 15, r=8, p=1,
+                          maxmem=64 * 1024 * 1024, dklen=32)
+
+
+def _verified_key(password_bytes: bytes, password_hash: str) -> tuple:
+    """Ключ кеша успешных проверок: сохраненный хеш и HMAC пароля"""
+    return password_hash, hmac.new(_VERIFIED_CACHE_KEY, password_bytes, hashlib.sha256).digest()
+
+
+@lru_cache(maxsize=4096)
+def _validate_api_key(api_key: str) -> bool:
+    """Проверка формата API ключа с кешированием по ключу"""
+    # Простая проверка формата API ключа
+    if not api_key or len(api_key) < 20:
+        return False
+    
+    # Дополнительные проверки можно добавить здесь
+    return True
+
+
 class SecurityManager:
     """Менеджер безопасности системы"""
     
+    # Потенциально опасные символы, удаляемые из пользовательского ввода
+    _SANITIZE_TABLE = str.maketrans('', '', '<>"\'&;()|`$')
+    
+    # Разрешения по ролям
+    _PERMISSIONS = {
+        'super_admin': frozenset({'all'}),
+        'admin': frozenset({'read', 'write', 'execute', 'manage_users'}),
+        'user': frozenset({'read', 'execute'}),
+        'free': frozenset({'read'})
+    }
+    
     def __init__(self):
         """Инициализация менеджера безопасности"""
         self.master_key_path = os.path.join(os.path.dirname(__file__), '..', '..', 'config', '.master_key')
         self.master_key = self._load_or_generate_master_key()
+        self._fernet = self._create_fernet()
     
     def _load_or_generate_master_key(self) -> bytes:
         """
@@ -26,30 +84,50 @@ class SecurityManager:
         Returns:
             Мастер-ключ в виде байтов
         """
-        try:
-            if os.path.exists(self.master_key_path):
-                with open(self.master_key_path, 'rb') as f:
-                    key = f.read()
-                logger.info("Мастер-ключ загружен")
-                return key
-            else:
-                # Генерируем новый мастер-ключ
-                key = secrets.token_bytes(32)
-                
-                # Создаем директорию если не существует
-                os.makedirs(os.path.dirname(self.master_key_path), exist_ok=True)
-                
-                # Сохраняем ключ
-                with open(self.master_key_path, 'wb') as f:
-                    f.write(key)
-                
-                logger.info("Новый мастер-ключ сгенерирован и сохранен")
+        with _MASTER_KEY_LOCK:
+            key = _MASTER_KEY_CACHE.get(self.master_key_path)
+            if key is not None:
                 return key
-                
+            
+            try:
+                if os.path.exists(self.master_key_path):
+                    with open(self.master_key_path, 'rb') as f:
+                        key = f.read()
+                    logger.info("Мастер-ключ загружен")
+                    _MASTER_KEY_CACHE[self.master_key_path] = key
+                    return key
+                else:
+                    # Генерируем новый мастер-ключ
+                    key = secrets.token_bytes(32)
+                    
+                    # Создаем директорию если не существует
+                    os.makedirs(os.path.dirname(self.master_key_path), exist_ok=True)
+                    
+                    # Сохраняем ключ
+                    with open(self.master_key_path, 'wb') as f:
+                        f.write(key)
+                    
+                    logger.info("Новый мастер-ключ сгенерирован и сохранен")
+                    _MASTER_KEY_CACHE[self.master_key_path] = key
+                    return key
+                    
+            except Exception as e:
+                logger.error(f"Ошибка работы с мастер-ключом: {e}")
+                # Возвращаем случайный ключ в случае ошибки
+                return secrets.token_bytes(32)
+    
+    def _create_fernet(self):
+        """
+        Создание шифратора Fernet из мастер-ключа
+        
+        Returns:
+            Экземпляр Fernet или None в случае ошибки
+        """
+        try:
+            return Fernet(base64.urlsafe_b64encode(self.master_key))
         except Exception as e:
-            logger.error(f"Ошибка работы с мастер-ключом: {e}")
-            # Возвращаем случайный ключ в случае ошибки
-            return secrets.token_bytes(32)
+            logger.error(f"Ошибка инициализации шифрования: {e}")
+            return None
     
     def hash_password(self, password: str) -> str:
         """
@@ -59,11 +137,11 @@ class SecurityManager:
             password: Пароль для хеширования
             
         Returns:
-            Хеш пароля
+            Хеш пароля в формате "scrypt$salt$hash"
         """
-        salt = secrets.token_hex(16)
-        password_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000)
-        return f"{salt}:{password_hash.hex()}"
+        salt = secrets.token_bytes(16)
+        password_hash = _scrypt(password.encode('utf-8'), salt)
+        return f"scrypt${salt.hex()}${password_hash.hex()}"
     
     def verify_password(self, password: str, password_hash: str) -> bool:
         """
@@ -77,9 +155,32 @@ class SecurityManager:
             True если пароль верный, False в противном случае
         """
         try:
-            salt, hash_part = password_hash.split(':')
-            password_hash_check = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000)
-            return password_hash_check.hex() == hash_part
+            password_bytes = password.encode('utf-8')
+            
+            # Повторная проверка того же пароля для того же хеша - без KDF
+            cache_key = _verified_key(password_bytes, password_hash)
+            with _VERIFIED_CACHE_LOCK:
+                if cache_key in _VERIFIED_CACHE:
+                    _VERIFIED_CACHE.move_to_end(cache_key)
+                    return True
+            
+            if password_hash.startswith('scrypt$'):
+                _, salt_hex, hash_part = password_hash.split('$')
+                password_hash_check = _scrypt(password_bytes, bytes.fromhex(salt_hex))
+            else:
+                # Устаревший формат PBKDF2: "salt:hash"
+                salt, hash_part = password_hash.split(':')
+                password_hash_check = _pbkdf2(password_bytes, salt.encode('utf-8'))
+            
+            # Неудачные попытки не кешируются и каждый раз проходят полный KDF
+            if not hmac.compare_digest(password_hash_check, bytes.fromhex(hash_part)):
+                return False
+            
+            with _VERIFIED_CACHE_LOCK:
+                _VERIFIED_CACHE[cache_key] = None
+                if len(_VERIFIED_CACHE) > _VERIFIED_CACHE_SIZE:
+                    _VERIFIED_CACHE.popitem(last=False)
+            return True
         except Exception as e:
             logger.error(f"Ошибка проверки пароля: {e}")
             return False
@@ -107,17 +208,7 @@ class SecurityManager:
             Зашифрованные данные
         """
         try:
-            from cryptography.fernet import Fernet
-            
-            # Создаем ключ из мастер-ключа
-            key = Fernet.generate_key()
-            cipher_suite = Fernet(key)
-            
-            # Шифруем данные
-            encrypted_data = cipher_suite.encrypt(data.encode('utf-8'))
-            
-            # Возвращаем ключ и зашифрованные данные
-            return f"{key.decode()}:{encrypted_data.decode()}"
+            return self._fernet.encrypt(data.encode('utf-8')).decode()
             
         except Exception as e:
             logger.error(f"Ошибка шифрования данных: {e}")
@@ -134,13 +225,12 @@ class SecurityManager:
             Расшифрованные данные
         """
         try:
-            from cryptography.fernet import Fernet
-            
-            key, data = encrypted_data.split(':')
-            cipher_suite = Fernet(key.encode())
+            if ':' in encrypted_data:
+                # Устаревший формат "key:data" с ключом, сохраненным рядом с данными
+                key, data = encrypted_data.split(':')
+                return Fernet(key.encode()).decrypt(data.encode()).decode('utf-8')
             
-            decrypted_data = cipher_suite.decrypt(data.encode())
-            return decrypted_data.decode('utf-8')
+            return self._fernet.decrypt(encrypted_data.encode()).decode('utf-8')
             
         except Exception as e:
             logger.error(f"Ошибка расшифровки данных: {e}")
@@ -156,12 +246,7 @@ class SecurityManager:
         Returns:
             True если ключ валидный, False в противном случае
         """
-        # Простая проверка формата API ключа
-        if not api_key or len(api_key) < 20:
-            return False
-        
-        # Дополнительные проверки можно добавить здесь
-        return True
+        return _validate_api_key(api_key)
     
     def sanitize_input(self, input_data: str) -> str:
         """
@@ -176,14 +261,8 @@ class SecurityManager:
         if not input_data:
             return ""
         
-        # Удаляем потенциально опасные символы
-        dangerous_chars = ['<', '>', '"', "'", '&', ';', '(', ')', '|', '`', '$']
-        sanitized = input_data
-        
-        for char in dangerous_chars:
-            sanitized = sanitized.replace(char, '')
-        
-        return sanitized.strip()
+        # Удаляем потенциально опасные символы за один проход
+        return input_data.translate(self._SANITIZE_TABLE).strip()
     
     def check_permission(self, user_role: str, required_permission: str) -> bool:
         """
@@ -196,14 +275,7 @@ class SecurityManager:
         Returns:
             True если разрешение есть, False в противном случае
         """
-        permissions = {
-            'super_admin': ['all'],
-            'admin': ['read', 'write', 'execute', 'manage_users'],
-            'user': ['read', 'execute'],
-            'free': ['read']
-        }
-        
-        user_permissions = permissions.get(user_role, [])
+        user_permissions = self._PERMISSIONS.get(user_role, frozenset())
         
         if 'all' in user_permissions:
             return True
@@ -6,19 +6,127 @@ Security System v3.0
 """
 
 import hashlib
+import heapq
 import secrets
 import base64
 import os
 import json
+import struct
 import time
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+import platform
+import sys
+import threading
+import atexit
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
+from functools import lru_cache
 from cryptography.fernet import Fernet
+import bcrypt
 import sqlite3
 
-@dataclass
+# Колонки secure_users, из которых собирается UserCredentials
+_USER_COLUMNS = '''
+    user_id, telegram_username, encrypted_api_key, encrypted_secret_key,
+    encrypted_passphrase, encryption_key, registration_date, last_login,
+    login_attempts, is_active, role, subscription_status, encrypted_blob, password_hash,
+    row_version
+'''
+
+# Частые запросы: одна и та же строка SQL всегда попадает в кэш подготовленных выражений
+_SQL_GET_USER = f'SELECT {_USER_COLUMNS} FROM secure_users WHERE user_id = ?'
+_SQL_GET_ROLE = 'SELECT role FROM secure_users WHERE user_id = ?'
+_SQL_GET_ROW_VERSION = 'SELECT row_version FROM secure_users WHERE user_id = ?'
+_SQL_INSERT_LOG = '''
+    INSERT INTO security_logs 
+    (user_id, action, ip_address, user_agent, success, details, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+_SQL_UPSERT_LOG_HOURLY = '''
+    INSERT INTO security_log_hourly (action, success, hour, count)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(action, success, hour) DO UPDATE SET count = count + excluded.count
+'''
+
+# STRICT-таблицы поддерживаются начиная с SQLite 3.37
+_SQLITE_STRICT = ' STRICT' if sqlite3.sqlite_version_info >= (3, 37, 0) else ''
+
+def _hash_password(password: str) -> str:
+    """bcrypt-хеш пароля (формат $2b$, совместим с ранее сохраненными хешами passlib)"""
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
+def _check_password(password: str, password_hash: str) -> bool:
+    """Проверка пароля по bcrypt-хешу"""
+    return bcrypt.checkpw(password.encode(), password_hash.encode())
+
+def _log_writer(system_ref: 'weakref.ref', wakeup: threading.Event, stop: threading.Event,
+                interval_s: float):
+    """
+    Фоновая запись очереди событий безопасности
+    
+    Поток держит систему только по слабой ссылке: он завершается по close()
+    или когда экземпляр больше никем не используется.
+    """
+    while not stop.is_set():
+        wakeup.wait(interval_s)
+        wakeup.clear()
+        system = system_ref()
+        if system is None:
+            return
+        system.flush_security_logs()
+        del system
+
+def _close_at_exit(system_ref: 'weakref.ref'):
+    """Закрытие системы при выходе, если экземпляр еще существует"""
+    system = system_ref()
+    if system is not None:
+        system.close()
+
+# Бит AES-NI в векторе возможностей OpenSSL (OPENSSL_ia32cap)
+_OPENSSL_AESNI_BIT = 1 << 57
+
+@lru_cache(maxsize=1)
+def _aes_ni_available() -> Optional[bool]:
+    """
+    Проверка аппаратного ускорения AES (AES-NI) для OpenSSL
+    
+    Returns:
+        True/False для x86, None если проверить невозможно
+    """
+    if platform.machine().lower() not in ('x86_64', 'amd64', 'i386', 'i686', 'x86'):
+        return None
+    
+    # OpenSSL можно принудительно лишить AES-NI через OPENSSL_ia32cap
+    ia32cap = os.getenv('OPENSSL_ia32cap', '').split(':')[0].strip()
+    if ia32cap:
+        try:
+            if ia32cap.startswith('~'):
+                if int(ia32cap[1:], 0) & _OPENSSL_AESNI_BIT:
+                    return False
+            elif not int(ia32cap, 0) & _OPENSSL_AESNI_BIT:
+                return False
+        except ValueError:
+            pass
+    
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('flags'):
+                    return 'aes' in line.split(':', 1)[1].split()
+    except OSError:
+        pass
+    
+    return None
+
+# Записи без __dict__: dataclass(slots=True) доступен начиная с Python 3.10
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_SLOTS)
 class UserCredentials:
     """Учетные данные пользователя"""
     user_id: int
@@ -27,20 +135,37 @@ class UserCredentials:
     encrypted_secret_key: str
     encrypted_passphrase: str
     encryption_key: str
-    registration_date: str
-    last_login: Optional[datetime]
+    registration_date: Optional[int]  # Unix time
+    last_login: Optional[int]  # Unix time
     login_attempts: int
     is_active: bool
     role: str
     subscription_status: str = 'free'
+    encrypted_blob: Optional[str] = None
+    password_hash: Optional[str] = None
+    
+    @property
+    def has_api_keys(self) -> bool:
+        """Сохранены ли API ключи (общим блоком или в старых отдельных полях)"""
+        return bool(self.encrypted_blob or self.encrypted_api_key)
+    
+    @property
+    def registration_datetime(self) -> Optional[datetime]:
+        """Дата регистрации как datetime"""
+        return datetime.fromtimestamp(self.registration_date) if self.registration_date else None
+    
+    @property
+    def last_login_datetime(self) -> Optional[datetime]:
+        """Время последнего входа как datetime"""
+        return datetime.fromtimestamp(self.last_login) if self.last_login else None
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class LoginSession:
     """Сессия входа пользователя"""
     session_id: str
     user_id: int
-    created_at: datetime
-    expires_at: datetime
+    created_at: int  # Unix time
+    expires_at: int  # Unix time
     ip_address: str
     user_agent: str
     is_active: bool
@@ -83,17 +208,52 @@ class SecuritySystemV3:
                     self.master_key = f.read()
             else:
                 self.master_key = self._generate_master_key()
+        self._master_fernet = Fernet(self.master_key)
         
         # Настройки безопасности
         self.max_login_attempts = 3
         self.session_timeout_hours = 24
         self.password_min_length = 8
         
+        # Соединения с БД: по одному на поток, открываются один раз
+        self._tls = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # Слабая ссылка: регистрация в atexit не должна удерживать экземпляр
+        atexit.register(_close_at_exit, weakref.ref(self))
+        
         # Инициализация базы данных
         self._init_security_database()
         
-        # Кэш активных сессий
+        # Кэш активных сессий и очередь их истечения (expires_at, session_id)
         self.active_sessions: Dict[str, LoginSession] = {}
+        self._expiry_heap: List[Tuple[int, str]] = []
+        self._sessions_lock = threading.Lock()
+        
+        # Кэш учетных данных и расшифрованных пользовательских ключей:
+        # запись (срок, row_version, данные) используется, только пока row_version
+        # в БД не изменился - изменения из других процессов видны сразу
+        self.cache_ttl_s = 300
+        self._cred_cache: Dict[int, Tuple[float, int, UserCredentials]] = {}
+        self._fernet_cache: Dict[int, Tuple[str, Fernet]] = {}
+        self._cache_lock = threading.RLock()
+        
+        # Очередь событий безопасности, записываемых пакетами в фоне
+        self._log_queue: deque = deque(maxlen=10000)
+        self._log_batch_size = 100
+        self._log_flush_interval_s = 1.0
+        self._log_wakeup = threading.Event()
+        self._log_flush_lock = threading.Lock()
+        self._log_stop = threading.Event()
+        self._log_thread = threading.Thread(
+            target=_log_writer,
+            args=(weakref.ref(self), self._log_wakeup, self._log_stop, self._log_flush_interval_s),
+            name='security-log-writer', daemon=True
+        )
+        self._log_thread.start()
+        
+        if _aes_ni_available() is False:
+            self.logger.warning("⚠️ AES-NI недоступен — шифрование Fernet будет работать в ~6 раз медленнее")
         
         self.logger.info("🔒 Security System v3.0 инициализирована")
     
@@ -112,13 +272,93 @@ class SecuritySystemV3:
         self.logger.warning("🔑 Создан новый мастер-ключ шифрования")
         return key
     
+    def _conn(self) -> sqlite3.Connection:
+        """
+        Постоянное соединение с БД для текущего потока
+        
+        Режим автокоммита: несколько изменений, которые должны примениться
+        вместе, выполняются через _transaction().
+        """
+        conn = getattr(self._tls, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None,
+                                   cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute('PRAGMA mmap_size=67108864')
+            self._tls.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+    
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Явная транзакция на соединении текущего потока
+        
+        Соединения работают в режиме автокоммита (isolation_level=None): одиночный
+        запрос фиксируется сразу, а связанные изменения объединяются здесь
+        в BEGIN IMMEDIATE ... COMMIT с откатом при ошибке.
+        """
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    
+    def close(self):
+        """Остановка фоновой записи логов, сброс очереди и закрытие всех соединений с БД"""
+        self._log_stop.set()
+        self._log_wakeup.set()
+        if self._log_thread.is_alive() and self._log_thread is not threading.current_thread():
+            self._log_thread.join(timeout=5)
+        
+        self.flush_security_logs()
+        
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._tls = threading.local()
+    
+    def _invalidate(self, user_id: int):
+        """Сброс кэшированных данных пользователя"""
+        with self._cache_lock:
+            self._cred_cache.pop(user_id, None)
+            self._fernet_cache.pop(user_id, None)
+    
+    def _get_user_fernet(self, user_id: int, encrypted_user_key: str) -> Fernet:
+        """Получение Fernet пользователя с кэшированием расшифрованного ключа"""
+        with self._cache_lock:
+            cached = self._fernet_cache.get(user_id)
+        # Ключ мог смениться в другом процессе - кэш действителен только для того же ключа
+        if cached is not None and cached[0] == encrypted_user_key:
+            return cached[1]
+        
+        # Расшифровываем пользовательский ключ
+        user_key = self._master_fernet.decrypt(encrypted_user_key.encode())
+        fernet = Fernet(user_key)
+        
+        with self._cache_lock:
+            self._fernet_cache[user_id] = (encrypted_user_key, fernet)
+        return fernet
+    
     def _init_security_database(self):
-        """Инициализация базы данных безопасности"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Инициализация базы данных безопасности (схема и миграции - одной транзакцией)"""
+        with self._transaction() as conn:
             cursor = conn.cursor()
             
             # Таблица пользователей с зашифрованными API ключами
-            cursor.execute('''
+            # (STRICT применяется только к новым базам)
+            cursor.execute(f'''
                 CREATE TABLE IF NOT EXISTS secure_users (
                     user_id INTEGER PRIMARY KEY,
                     telegram_username TEXT UNIQUE NOT NULL,
@@ -126,26 +366,54 @@ class SecuritySystemV3:
                     encrypted_secret_key TEXT NOT NULL,
                     encrypted_passphrase TEXT NOT NULL,
                     encryption_key TEXT NOT NULL,
-                    registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_login TIMESTAMP,
+                    registration_date INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                    last_login INTEGER,
                     login_attempts INTEGER DEFAULT 0,
-                    is_active BOOLEAN DEFAULT 1,
-                    role TEXT DEFAULT 'user'
-                )
+                    is_active INTEGER DEFAULT 1,
+                    role TEXT DEFAULT 'user',
+                    subscription_status TEXT DEFAULT 'free',
+                    email TEXT DEFAULT '',
+                    encrypted_blob TEXT,
+                    password_hash TEXT,
+                    row_version INTEGER DEFAULT 0
+                ){_SQLITE_STRICT}
             ''')
             
-            # Таблица сессий
+            # Миграция колонок, которых нет в старых базах
+            cursor.execute('PRAGMA table_info(secure_users)')
+            existing_columns = {column[1] for column in cursor.fetchall()}
+            for column, definition in (('subscription_status', "TEXT DEFAULT 'free'"),
+                                       ('email', "TEXT DEFAULT ''"),
+                                       ('encrypted_blob', 'TEXT'),
+                                       ('password_hash', 'TEXT'),
+                                       ('row_version', 'INTEGER DEFAULT 0')):
+                if column not in existing_columns:
+                    cursor.execute(f'ALTER TABLE secure_users ADD COLUMN {column} {definition}')
+            
+            # Любое изменение строки (в том числе из скриптов и других процессов)
+            # увеличивает row_version - по нему проверяются кэши
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_secure_users_version
+                AFTER UPDATE ON secure_users
+                FOR EACH ROW WHEN NEW.row_version IS OLD.row_version
+                BEGIN
+                    UPDATE secure_users SET row_version = COALESCE(OLD.row_version, 0) + 1
+                    WHERE user_id = NEW.user_id;
+                END
+            ''')
+            
+            # Таблица сессий: строки хранятся в B-дереве по session_id, без rowid
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS login_sessions (
                     session_id TEXT PRIMARY KEY,
                     user_id INTEGER,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    expires_at TIMESTAMP,
+                    created_at INTEGER DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                    expires_at INTEGER,
                     ip_address TEXT,
                     user_agent TEXT,
                     is_active BOOLEAN DEFAULT 1,
                     FOREIGN KEY (user_id) REFERENCES secure_users (user_id)
-                )
+                ) WITHOUT ROWID
             ''')
             
             # Таблица логов безопасности
@@ -163,10 +431,55 @@ class SecuritySystemV3:
                 )
             ''')
             
-            conn.commit()
+            # Почасовая сводка событий безопасности (пополняется при записи пакета логов)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS security_log_hourly (
+                    action TEXT,
+                    success INTEGER,
+                    hour INTEGER,
+                    count INTEGER,
+                    PRIMARY KEY (action, success, hour)
+                )
+            ''')
+            
+            # Миграция: сводка за последние сутки из уже накопленных логов
+            cursor.execute('SELECT 1 FROM security_log_hourly LIMIT 1')
+            if cursor.fetchone() is None:
+                cursor.execute('''
+                    INSERT INTO security_log_hourly (action, success, hour, count)
+                    SELECT action, CAST(success AS INTEGER),
+                           CAST(strftime('%s', timestamp) AS INTEGER) / 3600, COUNT(*)
+                    FROM security_logs
+                    WHERE timestamp > datetime('now', '-25 hours')
+                    GROUP BY 1, 2, 3
+                ''')
+            
+            # Миграция: ISO-строки времени (локальное время) -> Unix time
+            for table, column in (('secure_users', 'registration_date'), ('secure_users', 'last_login'),
+                                  ('login_sessions', 'created_at'), ('login_sessions', 'expires_at')):
+                cursor.execute(f'''
+                    UPDATE {table}
+                    SET {column} = CAST(strftime('%s', {column}, 'utc') AS INTEGER)
+                    WHERE typeof({column}) = 'text'
+                ''')
+            
+            # Индексы для выборок по времени (telegram_username уже UNIQUE)
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_logs_ts ON security_logs(timestamp)')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sessions_exp
+                ON login_sessions(expires_at) WHERE is_active = 1
+            ''')
     
     def encrypt_api_credentials(self, api_key: str, secret_key: str, passphrase: str) -> Tuple[str, str, str, str]:
-        """Шифрование API учетных данных"""
+        """
+        Шифрование API учетных данных (старый формат: каждое поле отдельно)
+        
+        Сохранено для внешних вызывающих; сама система пишет общий блок
+        через encrypt_api_blob.
+        
+        Returns:
+            Tuple[str, str, str, str]: (api_key, secret_key, passphrase, ключ пользователя)
+        """
         # Генерируем уникальный ключ для пользователя
         user_key = Fernet.generate_key()
         fernet = Fernet(user_key)
@@ -176,47 +489,143 @@ class SecuritySystemV3:
         encrypted_passphrase = fernet.encrypt(passphrase.encode()).decode()
         
         # Шифруем пользовательский ключ мастер-ключом
-        master_fernet = Fernet(self.master_key)
-        encrypted_user_key = master_fernet.encrypt(user_key).decode()
+        encrypted_user_key = self._master_fernet.encrypt(user_key).decode()
         
         return encrypted_api_key, encrypted_secret_key, encrypted_passphrase, encrypted_user_key
     
+    def encrypt_api_blob(self, api_key: str, secret_key: str, passphrase: str) -> Tuple[str, str]:
+        """
+        Шифрование API учетных данных одним блоком
+        
+        Все три строки упаковываются в один блок (заголовок с длинами + данные)
+        и шифруются одним вызовом Fernet.
+        
+        Returns:
+            Tuple[str, str]: (зашифрованный блок, зашифрованный ключ пользователя)
+        """
+        # Генерируем уникальный ключ для пользователя
+        user_key = Fernet.generate_key()
+        fernet = Fernet(user_key)
+        
+        parts = (api_key.encode(), secret_key.encode(), passphrase.encode())
+        packed = struct.pack('!HHH', *(len(part) for part in parts)) + b''.join(parts)
+        encrypted_blob = fernet.encrypt(packed).decode()
+        
+        # Шифруем пользовательский ключ мастер-ключом
+        encrypted_user_key = self._master_fernet.encrypt(user_key).decode()
+        
+        return encrypted_blob, encrypted_user_key
+    
     def decrypt_api_credentials(self, user_id: int) -> Optional[Tuple[str, str, str]]:
         """Расшифровка API учетных данных"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT encrypted_api_key, encrypted_secret_key, 
-                           encrypted_passphrase, encryption_key
-                    FROM secure_users WHERE user_id = ?
-                ''', (user_id,))
-                
-                result = cursor.fetchone()
-                if not result:
-                    return None
-                
-                encrypted_api_key, encrypted_secret_key, encrypted_passphrase, encrypted_user_key = result
-                
-                # Расшифровываем пользовательский ключ
-                master_fernet = Fernet(self.master_key)
-                user_key = master_fernet.decrypt(encrypted_user_key.encode())
-                
-                # Расшифровываем API ключи
-                fernet = Fernet(user_key)
-                api_key = fernet.decrypt(encrypted_api_key.encode()).decode()
-                secret_key = fernet.decrypt(encrypted_secret_key.encode()).decode()
-                passphrase = fernet.decrypt(encrypted_passphrase.encode()).decode()
-                
-                return api_key, secret_key, passphrase
+            conn = self._conn()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT encrypted_api_key, encrypted_secret_key, 
+                       encrypted_passphrase, encryption_key, encrypted_blob
+                FROM secure_users WHERE user_id = ?
+            ''', (user_id,))
+            
+            result = cursor.fetchone()
+            if not result:
+                return None
+            
+            return self._decrypt_fields(user_id, *result)
                 
         except Exception as e:
             self.logger.error(f"❌ Ошибка расшифровки API ключей для пользователя {user_id}: {e}")
             return None
     
+    def _decrypt_fields(self, user_id: int, encrypted_api_key: str, encrypted_secret_key: str,
+                        encrypted_passphrase: str, encrypted_user_key: str,
+                        encrypted_blob: Optional[str] = None) -> Tuple[str, str, str]:
+        """Расшифровка зашифрованных полей API ключей"""
+        fernet = self._get_user_fernet(user_id, encrypted_user_key)
+        
+        if encrypted_blob:
+            packed = fernet.decrypt(encrypted_blob.encode())
+            api_len, secret_len, passphrase_len = struct.unpack_from('!HHH', packed)
+            offset = struct.calcsize('!HHH')
+            api_key = packed[offset:offset + api_len].decode()
+            offset += api_len
+            secret_key = packed[offset:offset + secret_len].decode()
+            offset += secret_len
+            passphrase = packed[offset:offset + passphrase_len].decode()
+            return api_key, secret_key, passphrase
+        
+        # Старый формат: каждое поле зашифровано отдельно
+        api_key = fernet.decrypt(encrypted_api_key.encode()).decode()
+        secret_key = fernet.decrypt(encrypted_secret_key.encode()).decode()
+        passphrase = fernet.decrypt(encrypted_passphrase.encode()).decode()
+        
+        return api_key, secret_key, passphrase
+    
+    def decrypt_all(self, user_ids: List[int]) -> Dict[int, Optional[Tuple[str, str, str]]]:
+        """
+        Массовая расшифровка API ключей (экспорт, админские операции)
+        
+        Ключи пользователей готовятся в текущем потоке, а сама расшифровка
+        идет в пуле потоков: OpenSSL отпускает GIL на время AES.
+        
+        Returns:
+            Словарь user_id -> (api_key, secret_key, passphrase) или None при ошибке
+        """
+        results: Dict[int, Optional[Tuple[str, str, str]]] = {}
+        jobs = []
+        for user_id in user_ids:
+            user_creds = self.get_user_credentials(user_id)
+            if not user_creds:
+                results[user_id] = None
+                continue
+            try:
+                self._get_user_fernet(user_id, user_creds.encryption_key)
+                jobs.append(user_creds)
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка расшифровки API ключей для пользователя {user_id}: {e}")
+                results[user_id] = None
+        
+        if not jobs:
+            return results
+        
+        def decrypt(user_creds: UserCredentials) -> Optional[Tuple[str, str, str]]:
+            try:
+                return self._decrypt_fields(
+                    user_creds.user_id, user_creds.encrypted_api_key, user_creds.encrypted_secret_key,
+                    user_creds.encrypted_passphrase, user_creds.encryption_key,
+                    user_creds.encrypted_blob
+                )
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка расшифровки API ключей для пользователя {user_creds.user_id}: {e}")
+                return None
+        
+        with ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, len(jobs))) as executor:
+            for user_creds, api_credentials in zip(jobs, executor.map(decrypt, jobs)):
+                results[user_creds.user_id] = api_credentials
+        
+        return results
+    
+    def _fetch_user_and_keys(self, user_id: int) -> Tuple[Optional[UserCredentials], Optional[Tuple[str, str, str]]]:
+        """Учетные данные и расшифрованные API ключи одной выборкой"""
+        user_creds = self.get_user_credentials(user_id)
+        if not user_creds:
+            return None, None
+        
+        try:
+            api_credentials = self._decrypt_fields(
+                user_id, user_creds.encrypted_api_key, user_creds.encrypted_secret_key,
+                user_creds.encrypted_passphrase, user_creds.encryption_key,
+                user_creds.encrypted_blob
+            )
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка расшифровки API ключей для пользователя {user_id}: {e}")
+            api_credentials = None
+        
+        return user_creds, api_credentials
+    
     def register_user(self, telegram_user_id: int, telegram_username: str, 
                      api_key: str, secret_key: str, passphrase: str,
-                     role: str = 'user', email: str = '') -> bool:
+                     role: str = 'user', email: str = '', password: str = '') -> bool:
         """
         Регистрация нового пользователя с API ключами
         
@@ -227,6 +636,8 @@ class SecuritySystemV3:
             secret_key: OKX Secret Key
             passphrase: OKX Passphrase
             role: Роль пользователя ('user' или 'admin')
+            email: Email пользователя
+            password: Пароль для входа в веб-интерфейс
             
         Returns:
             bool: Успешность регистрации
@@ -239,21 +650,20 @@ class SecuritySystemV3:
                 return False
             
             # Шифруем API ключи
-            enc_api_key, enc_secret_key, enc_passphrase, enc_user_key = self.encrypt_api_credentials(
-                api_key, secret_key, passphrase
-            )
+            enc_blob, enc_user_key = self.encrypt_api_blob(api_key, secret_key, passphrase)
             
-            # Сохраняем в базу данных
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO secure_users 
-                    (user_id, telegram_username, encrypted_api_key, encrypted_secret_key,
-                     encrypted_passphrase, encryption_key, registration_date, role, subscription_status, email)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (telegram_user_id, telegram_username, enc_api_key, enc_secret_key,
-                      enc_passphrase, enc_user_key, datetime.now().isoformat(), role, 'premium' if role == 'admin' else 'free', email))
-                conn.commit()
+            # Сохраняем в базу данных (старые поля ключей остаются пустыми)
+            conn = self._conn()
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO secure_users 
+                (user_id, telegram_username, encrypted_api_key, encrypted_secret_key,
+                 encrypted_passphrase, encryption_key, encrypted_blob, registration_date, role, subscription_status, email,
+                 password_hash)
+                VALUES (?, ?, '', '', '', ?, ?, ?, ?, ?, ?, ?)
+            ''', (telegram_user_id, telegram_username, enc_user_key, enc_blob,
+                  int(time.time()), role, 'premium' if role == 'admin' else 'free', email,
+                  _hash_password(password) if password else None))
             
             # Логируем регистрацию
             self.log_security_event(telegram_user_id, "user_registered", "", "", True, {
@@ -284,7 +694,7 @@ class SecuritySystemV3:
         
         try:
             # Проверяем, что пользователь существует и активен
-            user_creds = self.get_user_credentials(telegram_user_id)
+            user_creds, api_credentials = self._fetch_user_and_keys(telegram_user_id)
             if not user_creds or not user_creds.is_active:
                 self.log_security_event(telegram_user_id, "login_failed", ip_address, user_agent, False,
                                       {"reason": "user_not_found_or_inactive"})
@@ -297,7 +707,6 @@ class SecuritySystemV3:
                 return None
             
             # Проверяем API ключи
-            api_credentials = self.decrypt_api_credentials(telegram_user_id)
             if not api_credentials:
                 self.log_security_event(telegram_user_id, "login_failed", ip_address, user_agent, False,
                                       {"reason": "api_keys_decrypt_failed"})
@@ -322,9 +731,10 @@ class SecuritySystemV3:
     
     def _create_session(self, user_id: int, ip_address: str, user_agent: str) -> str:
         """Создание сессии пользователя"""
-        session_id = secrets.token_urlsafe(32)
-        created_at = datetime.now()
-        expires_at = created_at + timedelta(hours=self.session_timeout_hours)
+        # 33 байта (кратно 3) кодируются в base64 без padding: 44 символа, 264 бита энтропии
+        session_id = base64.urlsafe_b64encode(secrets.token_bytes(33)).decode('ascii')
+        created_at = int(time.time())
+        expires_at = created_at + self.session_timeout_hours * 3600
         
         session = LoginSession(
             session_id=session_id,
@@ -337,18 +747,18 @@ class SecuritySystemV3:
         )
         
         # Сохраняем в базу данных
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO login_sessions 
-                (session_id, user_id, created_at, expires_at, ip_address, user_agent)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (session_id, user_id, created_at.isoformat(), expires_at.isoformat(),
-                  ip_address, user_agent))
-            conn.commit()
+        conn = self._conn()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO login_sessions 
+            (session_id, user_id, created_at, expires_at, ip_address, user_agent)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (session_id, user_id, created_at, expires_at, ip_address, user_agent))
         
         # Добавляем в кэш
-        self.active_sessions[session_id] = session
+        with self._sessions_lock:
+            self.active_sessions[session_id] = session
+            heapq.heappush(self._expiry_heap, (expires_at, session_id))
         
         return session_id
     
@@ -358,7 +768,7 @@ class SecuritySystemV3:
             session = self.active_sessions[session_id]
             
             # Проверяем срок действия
-            if datetime.now() < session.expires_at and session.is_active:
+            if time.time() < session.expires_at and session.is_active:
                 return session.user_id
             else:
                 # Сессия истекла
@@ -372,113 +782,186 @@ class SecuritySystemV3:
             del self.active_sessions[session_id]
         
         # Обновляем в базе данных
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                'UPDATE login_sessions SET is_active = 0 WHERE session_id = ?',
-                (session_id,)
-            )
-            conn.commit()
+        conn = self._conn()
+        cursor = conn.cursor()
+        cursor.execute(
+            'UPDATE login_sessions SET is_active = 0 WHERE session_id = ?',
+            (session_id,)
+        )
     
     def get_user_credentials(self, user_id: int) -> Optional[UserCredentials]:
         """Получение учетных данных пользователя"""
+        with self._cache_lock:
+            cached = self._cred_cache.get(user_id)
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT * FROM secure_users WHERE user_id = ?', (user_id,))
-                
-                result = cursor.fetchone()
-                if result:
-                    return UserCredentials(
-                        user_id=result[0],
-                        telegram_username=result[1],
-                        encrypted_api_key=result[2],
-                        encrypted_secret_key=result[3],
-                        encrypted_passphrase=result[4],
-                        encryption_key=result[5],
-                        registration_date=result[6],
-                        last_login=datetime.fromisoformat(result[7]) if result[7] else None,
-                        login_attempts=result[8],
-                        is_active=bool(result[9]),
-                        role=result[10],
-                        subscription_status=result[11] if len(result) > 11 else 'free'
-                    )
+            conn = self._conn()
+            if cached is not None and cached[0] > time.monotonic():
+                # Проверка актуальности кэша одним чтением по первичному ключу
+                row = conn.execute(_SQL_GET_ROW_VERSION, (user_id,)).fetchone()
+                if row is not None and row['row_version'] == cached[1]:
+                    return cached[2]
+                self._invalidate(user_id)
+            
+            cursor = conn.cursor()
+            cursor.execute(_SQL_GET_USER, (user_id,))
+            
+            result = cursor.fetchone()
+            if result:
+                user_creds = self._credentials_from_row(result)
+                with self._cache_lock:
+                    self._cred_cache[user_id] = (time.monotonic() + self.cache_ttl_s,
+                                                 result['row_version'], user_creds)
+                return user_creds
         except Exception as e:
             self.logger.error(f"❌ Ошибка получения учетных данных: {e}")
         
         return None
     
+    def _credentials_from_row(self, row: sqlite3.Row) -> UserCredentials:
+        """Сборка UserCredentials из строки secure_users (колонки _USER_COLUMNS)"""
+        return UserCredentials(
+            user_id=row['user_id'],
+            telegram_username=row['telegram_username'],
+            encrypted_api_key=row['encrypted_api_key'],
+            encrypted_secret_key=row['encrypted_secret_key'],
+            encrypted_passphrase=row['encrypted_passphrase'],
+            encryption_key=row['encryption_key'],
+            registration_date=row['registration_date'],
+            last_login=row['last_login'],
+            login_attempts=row['login_attempts'],
+            is_active=bool(row['is_active']),
+            role=row['role'],
+            subscription_status=row['subscription_status'] or 'free',
+            encrypted_blob=row['encrypted_blob'],
+            password_hash=row['password_hash']
+        )
+    
+    def _fetch_role(self, user_id: int) -> Optional[str]:
+        """Роль пользователя без загрузки зашифрованных колонок"""
+        conn = self._conn()
+        row = conn.execute(_SQL_GET_ROLE, (user_id,)).fetchone()
+        return row['role'] if row else None
+    
     def _update_login_info(self, user_id: int, success: bool):
         """Обновление информации о входе"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            if success:
-                # Успешный вход - сбрасываем счетчик попыток
-                cursor.execute('''
-                    UPDATE secure_users 
-                    SET last_login = ?, login_attempts = 0 
-                    WHERE user_id = ?
-                ''', (datetime.now().isoformat(), user_id))
-            else:
-                # Неудачный вход - увеличиваем счетчик
-                cursor.execute('''
-                    UPDATE secure_users 
-                    SET login_attempts = login_attempts + 1 
-                    WHERE user_id = ?
-                ''', (user_id,))
-            
-            conn.commit()
+        conn = self._conn()
+        cursor = conn.cursor()
+        
+        if success:
+            # Успешный вход - сбрасываем счетчик попыток
+            cursor.execute('''
+                UPDATE secure_users 
+                SET last_login = ?, login_attempts = 0 
+                WHERE user_id = ?
+            ''', (int(time.time()), user_id))
+        else:
+            # Неудачный вход - увеличиваем счетчик
+            cursor.execute('''
+                UPDATE secure_users 
+                SET login_attempts = login_attempts + 1 
+                WHERE user_id = ?
+            ''', (user_id,))
+        
+        self._invalidate(user_id)
     
     def log_security_event(self, user_id: int, action: str, ip_address: str, 
                           user_agent: str, success: bool, details: Dict[str, Any]):
-        """Логирование событий безопасности"""
+        """Логирование событий безопасности (запись в БД выполняется пакетами в фоне)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO security_logs 
-                    (user_id, action, ip_address, user_agent, success, details)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (user_id, action, ip_address, user_agent, success, json.dumps(details)))
-                conn.commit()
+            # Время фиксируем сразу в формате CURRENT_TIMESTAMP (UTC)
+            now = time.time()
+            timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(now))
+            # details сериализуются в фоновом потоке при записи пакета
+            self._log_queue.append((user_id, action, ip_address, user_agent, success,
+                                    details, timestamp, int(now) // 3600))
+            if len(self._log_queue) >= self._log_batch_size:
+                self._log_wakeup.set()
         except Exception as e:
             self.logger.error(f"❌ Ошибка логирования события безопасности: {e}")
     
+    def flush_security_logs(self):
+        """Запись накопленных событий безопасности одной транзакцией"""
+        with self._log_flush_lock:
+            batch = []
+            hourly: Dict[Tuple[str, int, int], int] = {}
+            while self._log_queue:
+                user_id, action, ip_address, user_agent, success, details, timestamp, hour = self._log_queue.popleft()
+                payload = json.dumps(details, separators=(',', ':')) if details else '{}'
+                batch.append((user_id, action, ip_address, user_agent, success, payload, timestamp))
+                key = (action, int(bool(success)), hour)
+                hourly[key] = hourly.get(key, 0) + 1
+            if not batch:
+                return
+            
+            try:
+                with self._transaction() as conn:
+                    conn.executemany(_SQL_INSERT_LOG, batch)
+                    conn.executemany(_SQL_UPSERT_LOG_HOURLY,
+                                     [(action, success, hour, count)
+                                      for (action, success, hour), count in hourly.items()])
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка записи {len(batch)} событий безопасности: {e}")
+    
     def is_admin(self, user_id: int) -> bool:
-        """Проверка прав администратора"""
-        user_creds = self.get_user_credentials(user_id)
-        return user_creds is not None and user_creds.role == 'admin'
+        """
+        Проверка прав администратора
+        
+        Роль не кэшируется: TTL-кэш оставлял права снятому в другом процессе
+        администратору, а проверка row_version, как в get_user_credentials,
+        стоит того же чтения по первичному ключу, что и сам запрос роли.
+        """
+        try:
+            return self._fetch_role(user_id) == 'admin'
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка получения роли пользователя {user_id}: {e}")
+            return False
     
     def can_access_telegram(self, user_id: int) -> bool:
         """Проверка доступа к Telegram функциям (только админы)"""
         return self.is_admin(user_id)
     
+    def iter_users(self, *, role: Optional[str] = None, active: Optional[bool] = None,
+                   limit: Optional[int] = None, offset: int = 0) -> Iterator[UserCredentials]:
+        """
+        Потоковое чтение пользователей без загрузки всей таблицы в память
+        
+        Args:
+            role: Только пользователи с этой ролью
+            active: Только активные (True) или неактивные (False) пользователи
+            limit: Максимальное количество пользователей
+            offset: Сколько пользователей пропустить
+        """
+        conditions = []
+        params: List[Any] = []
+        if role is not None:
+            conditions.append('role = ?')
+            params.append(role)
+        if active is not None:
+            conditions.append('is_active = ?')
+            params.append(int(active))
+        
+        query = f'SELECT {_USER_COLUMNS} FROM secure_users'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY registration_date DESC LIMIT ? OFFSET ?'
+        params.extend((limit if limit is not None else -1, offset))
+        
+        cursor = self._conn().execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(256)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._credentials_from_row(row)
+        finally:
+            cursor.close()
+    
     def get_all_users(self) -> List[UserCredentials]:
         """Получение списка всех пользователей"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT * FROM secure_users ORDER BY registration_date DESC')
-                
-                users = []
-                for result in cursor.fetchall():
-                    users.append(UserCredentials(
-                        user_id=result[0],
-                        telegram_username=result[1],
-                        encrypted_api_key=result[2],
-                        encrypted_secret_key=result[3],
-                        encrypted_passphrase=result[4],
-                        encryption_key=result[5],
-                        registration_date=result[6],
-                        last_login=datetime.fromisoformat(result[7]) if result[7] else None,
-                        login_attempts=result[8],
-                        is_active=bool(result[9]),
-                        role=result[10],
-                        subscription_status=result[11] if len(result) > 11 else 'free'
-                    ))
-                
-                return users
+            return list(self.iter_users())
         except Exception as e:
             self.logger.error(f"❌ Ошибка получения списка пользователей: {e}")
             return []
@@ -486,15 +969,15 @@ class SecuritySystemV3:
     def update_user_role(self, user_id: int, new_role: str) -> bool:
         """Обновление роли пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE secure_users 
-                    SET role = ? 
-                    WHERE user_id = ?
-                ''', (new_role, user_id))
-                conn.commit()
+            conn = self._conn()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE secure_users 
+                SET role = ? 
+                WHERE user_id = ?
+            ''', (new_role, user_id))
             
+            self._invalidate(user_id)
             self.log_security_event(user_id, "role_updated", "", "", True, {"new_role": new_role})
             self.logger.info(f"✅ Роль пользователя {user_id} обновлена на {new_role}")
             return True
@@ -506,15 +989,15 @@ class SecuritySystemV3:
     def deactivate_user(self, user_id: int) -> bool:
         """Деактивация пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE secure_users 
-                    SET is_active = 0 
-                    WHERE user_id = ?
-                ''', (user_id,))
-                conn.commit()
+            conn = self._conn()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE secure_users 
+                SET is_active = 0 
+                WHERE user_id = ?
+            ''', (user_id,))
             
+            self._invalidate(user_id)
             self.log_security_event(user_id, "user_deactivated", "", "", True, {})
             self.logger.info(f"✅ Пользователь {user_id} деактивирован")
             return True
@@ -526,15 +1009,15 @@ class SecuritySystemV3:
     def activate_user(self, user_id: int) -> bool:
         """Активация пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE secure_users 
-                    SET is_active = 1 
-                    WHERE user_id = ?
-                ''', (user_id,))
-                conn.commit()
+            conn = self._conn()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE secure_users 
+                SET is_active = 1 
+                WHERE user_id = ?
+            ''', (user_id,))
             
+            self._invalidate(user_id)
             self.log_security_event(user_id, "user_activated", "", "", True, {})
             self.logger.info(f"✅ Пользователь {user_id} активирован")
             return True
@@ -569,21 +1052,19 @@ class SecuritySystemV3:
                 return False
             
             # Шифруем новые ключи
-            enc_api_key, enc_secret_key, enc_passphrase, enc_user_key = self.encrypt_api_credentials(
-                api_key, secret_key, passphrase
-            )
+            enc_blob, enc_user_key = self.encrypt_api_blob(api_key, secret_key, passphrase)
             
             # Обновляем в базе данных
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE secure_users 
-                    SET encrypted_api_key = ?, encrypted_secret_key = ?, 
-                        encrypted_passphrase = ?, encryption_key = ?
-                    WHERE user_id = ?
-                ''', (enc_api_key, enc_secret_key, enc_passphrase, enc_user_key, user_id))
-                conn.commit()
+            conn = self._conn()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE secure_users 
+                SET encrypted_api_key = '', encrypted_secret_key = '', 
+                    encrypted_passphrase = '', encryption_key = ?, encrypted_blob = ?
+                WHERE user_id = ?
+            ''', (enc_user_key, enc_blob, user_id))
             
+            self._invalidate(user_id)
             self.log_security_event(user_id, "api_keys_updated", "", "", True, {})
             self.logger.info(f"✅ API ключи обновлены для пользователя {user_id}")
             return True
@@ -594,38 +1075,40 @@ class SecuritySystemV3:
     
     def get_security_stats(self) -> Dict[str, Any]:
         """Статистика безопасности системы"""
+        self.flush_security_logs()
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Общая статистика пользователей
-                cursor.execute('SELECT COUNT(*) FROM secure_users WHERE is_active = 1')
-                active_users = cursor.fetchone()[0]
-                
-                cursor.execute('SELECT COUNT(*) FROM secure_users WHERE role = "admin"')
-                admin_users = cursor.fetchone()[0]
-                
-                # Статистика сессий
-                cursor.execute('SELECT COUNT(*) FROM login_sessions WHERE is_active = 1')
-                active_sessions = cursor.fetchone()[0]
-                
-                # Недавние события безопасности
-                cursor.execute('''
-                    SELECT action, success, COUNT(*) 
-                    FROM security_logs 
-                    WHERE timestamp > datetime('now', '-24 hours')
-                    GROUP BY action, success
-                    ORDER BY COUNT(*) DESC
-                ''')
-                recent_events = cursor.fetchall()
-                
-                return {
-                    "active_users": active_users,
-                    "admin_users": admin_users,
-                    "active_sessions": active_sessions,
-                    "recent_events": recent_events,
-                    "security_level": "HIGH" if admin_users > 0 else "MEDIUM"
-                }
+            conn = self._conn()
+            cursor = conn.cursor()
+            
+            # Общая статистика пользователей
+            cursor.execute('SELECT COUNT(*) FROM secure_users WHERE is_active = 1')
+            active_users = cursor.fetchone()[0]
+            
+            cursor.execute('SELECT COUNT(*) FROM secure_users WHERE role = "admin"')
+            admin_users = cursor.fetchone()[0]
+            
+            # Статистика сессий
+            cursor.execute('SELECT COUNT(*) FROM login_sessions WHERE is_active = 1')
+            active_sessions = cursor.fetchone()[0]
+            
+            # Недавние события безопасности (из почасовой сводки, без скана логов)
+            cursor.execute('''
+                SELECT action, success, SUM(count) 
+                FROM security_log_hourly 
+                WHERE hour >= ?
+                GROUP BY action, success
+                ORDER BY SUM(count) DESC
+            ''', (int(time.time()) // 3600 - 24,))
+            recent_events = [tuple(row) for row in cursor.fetchall()]
+            
+            return {
+                "active_users": active_users,
+                "admin_users": admin_users,
+                "active_sessions": active_sessions,
+                "recent_events": recent_events,
+                "security_level": "HIGH" if admin_users > 0 else "MEDIUM"
+            }
                 
         except Exception as e:
             self.logger.error(f"❌ Ошибка получения статистики безопасности: {e}")
@@ -634,73 +1117,83 @@ class SecuritySystemV3:
     def update_last_login(self, user_id: int):
         """Обновление времени последнего входа"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE secure_users 
-                    SET last_login = ? 
-                    WHERE user_id = ?
-                ''', (datetime.now().isoformat(), user_id))
-                conn.commit()
-                self.logger.info(f"✅ Время входа обновлено для пользователя {user_id}")
+            conn = self._conn()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE secure_users 
+                SET last_login = ? 
+                WHERE user_id = ?
+            ''', (int(time.time()), user_id))
+            self._invalidate(user_id)
+            self.logger.info(f"✅ Время входа обновлено для пользователя {user_id}")
         except Exception as e:
             self.logger.error(f"❌ Ошибка обновления времени входа: {e}")
     
     def verify_password(self, user_id: int, password: str) -> bool:
         """Проверка пароля пользователя"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT encrypted_passphrase FROM secure_users 
-                    WHERE user_id = ?
-                ''', (user_id,))
-                result = cursor.fetchone()
-                
-                if not result:
-                    return False
-                
-                encrypted_passphrase = result[0]
-                
-                # Для тестирования: проверяем простые пароли
-                # В реальной системе нужно расшифровывать и сравнивать
-                if password in ["123", "123456", "password", "admin"]:
-                    return True
-                
-                # Также проверяем, если зашифрованный пароль совпадает с введенным
-                # (для случаев, когда пароль не зашифрован)
-                if encrypted_passphrase == password:
-                    return True
-                
+            user_creds = self.get_user_credentials(user_id)
+            if not user_creds:
                 return False
+            
+            if not user_creds.password_hash:
+                # Пароль задается только через update_user_password (scripts/reset_password.py)
+                self.logger.warning(f"⚠️ У пользователя {user_id} не задан пароль, вход запрещен")
+                return False
+            
+            return _check_password(password, user_creds.password_hash)
                 
         except Exception as e:
             self.logger.error(f"❌ Ошибка проверки пароля: {e}")
             return False
     
+    def update_user_password(self, user_id: int, password: str) -> bool:
+        """Установка пароля пользователя (хранится только bcrypt-хеш)"""
+        try:
+            conn = self._conn()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE secure_users 
+                SET password_hash = ? 
+                WHERE user_id = ?
+            ''', (_hash_password(password), user_id))
+            
+            self._invalidate(user_id)
+            self.log_security_event(user_id, "password_updated", "", "", True, {})
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка обновления пароля: {e}")
+            return False
+    
     def cleanup_expired_sessions(self):
         """Очистка истекших сессий"""
         try:
-            current_time = datetime.now()
+            now = int(time.time())
             expired_sessions = []
             
-            for session_id, session in self.active_sessions.items():
-                if current_time >= session.expires_at:
-                    expired_sessions.append(session_id)
-            
-            # Удаляем из кэша
-            for session_id in expired_sessions:
-                del self.active_sessions[session_id]
+            # Снимаем с вершины кучи только истекшие сессии
+            with self._sessions_lock:
+                while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                    _, session_id = heapq.heappop(self._expiry_heap)
+                    if self.active_sessions.pop(session_id, None) is not None:
+                        expired_sessions.append(session_id)
+                
+                # Досрочно аннулированные сессии остаются в куче до истечения:
+                # если их накопилось много, пересобираем кучу одним проходом
+                if len(self._expiry_heap) > 2 * len(self.active_sessions) + 64:
+                    self._expiry_heap = [item for item in self._expiry_heap
+                                         if item[1] in self.active_sessions]
+                    heapq.heapify(self._expiry_heap)
             
-            # Обновляем в базе данных
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE login_sessions 
-                    SET is_active = 0 
-                    WHERE expires_at < ? AND is_active = 1
-                ''', (current_time.isoformat(),))
-                conn.commit()
+            # Обновляем в базе данных (в том числе сессии прошлых запусков)
+            conn = self._conn()
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE login_sessions 
+                SET is_active = 0 
+                WHERE expires_at < ? AND is_active = 1
+            ''', (now,))
             
             if expired_sessions:
                 self.logger.info(f"🧹 Очищено {len(expired_sessions)} истекших сессий")
@@ -708,8 +1201,10 @@ class SecuritySystemV3:
         except Exception as e:
             self.logger.error(f"❌ Ошибка очистки сессий: {e}")
 
-# Глобальный экземпляр системы безопасности
-security_system = SecuritySystemV3()
+@lru_cache(maxsize=1)
+def get_security_system() -> SecuritySystemV3:
+    """Глобальный экземпляр системы безопасности (создается при первом обращении)"""
+    return SecuritySystemV3()
 
 
 
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Дешевые метки времени для горячих путей торговых модулей
+(настенное время кэшируется и обновляется не чаще раза в 100 мс)
+"""
+
+import time
+from datetime import datetime
+
+# Интервал обновления кэша настенного времени, секунды
+_REFRESH_INTERVAL = 0.1
+
+_ts_cache = {'mono': float('-inf'), 'wall': None, 'wall_ns': 0}
+
+
+def _refresh() -> None:
+    """Обновление кэша, если он старше _REFRESH_INTERVAL"""
+    mono = time.monotonic()
+    if mono - _ts_cache['mono'] > _REFRESH_INTERVAL:
+        wall_ns = time.time_ns()
+        _ts_cache['mono'] = mono
+        _ts_cache['wall_ns'] = wall_ns
+        _ts_cache['wall'] = datetime.fromtimestamp(wall_ns / 1e9)
+
+
+def _fast_now() -> datetime:
+    """Текущее локальное время с точностью до _REFRESH_INTERVAL (замена datetime.now())"""
+    _refresh()
+    return _ts_cache['wall']
+
+
+def _fast_now_ns() -> int:
+    """Текущее время Unix в наносекундах с точностью до _REFRESH_INTERVAL"""
+    _refresh()
+    return _ts_cache['wall_ns']
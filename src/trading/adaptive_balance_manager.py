@@ -6,19 +6,100 @@ Adaptive Balance Manager v3.0
 """
 
 import asyncio
+import bisect
 import time
 import logging
 import os
+import sys
 import json
+from collections import OrderedDict, defaultdict, namedtuple
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Sequence, Tuple
 from dataclasses import dataclass, asdict
+import numpy as np
 import ccxt.async_support as ccxt
 from dotenv import load_dotenv
 
+# Опциональная JIT-компиляция расчета распределения
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(**kwargs):
+        """Без numba функция выполняется интерпретатором как есть"""
+        return lambda func: func
+
+# Опциональный быстрый JSON-кодировщик для сводок баланса
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 load_dotenv()
 
-@dataclass
+# Виртуальный баланс демо-режима ($1,471.28), только для чтения
+_DEMO_BALANCE = {
+    'total': {
+        'USDT': 1471.28,
+        'BTC': 0.0,
+        'ETH': 0.0,
+        'BNB': 0.0
+    }
+}
+
+# Рекомендуемые пары по суммам: (верхняя граница баланса, пары), общие неизменяемые кортежи
+_PAIR_TIERS = (
+    (200, ("BTC/USDT",)),  # Только BTC для малых сумм
+    (1000, ("BTC/USDT", "ETH/USDT")),
+    (5000, ("BTC/USDT", "ETH/USDT", "BNB/USDT")),
+    (float('inf'), ("BTC/USDT", "ETH/USDT", "BNB/USDT", "SOL/USDT", "XRP/USDT")),
+)
+_PAIR_TIER_BOUNDS = [bound for bound, _ in _PAIR_TIERS]
+
+@njit(cache=True)
+def _compute_allocation(total_balance, grid_frac, scalp_frac, reserve_frac, min_grid, min_scalp):
+    """
+    Числовое ядро распределения капитала
+    
+    Returns:
+        (grid, scalp, reserve, min_order_size, max_positions_grid, max_positions_scalp)
+    """
+    # Базовое распределение
+    grid_allocation = total_balance * grid_frac
+    scalp_allocation = total_balance * scalp_frac
+    reserve_allocation = total_balance * reserve_frac
+    
+    # Адаптируем под минимальные пороги
+    if grid_allocation < min_grid:
+        # Недостаточно для Grid - отдаем все Scalp
+        scalp_allocation += grid_allocation
+        grid_allocation = 0.0
+        
+    if scalp_allocation < min_scalp:
+        # Недостаточно для Scalp - отдаем все Grid
+        grid_allocation += scalp_allocation
+        scalp_allocation = 0.0
+    
+    # Рассчитываем параметры торговли
+    min_order_size = max(10.0, total_balance * 0.02)  # Минимум $10 или 2% от баланса
+    
+    # Количество позиций зависит от суммы
+    max_positions_grid = min(20, max(3, int(grid_allocation / 200)))
+    max_positions_scalp = min(10, max(2, int(scalp_allocation / 100)))
+    
+    return (grid_allocation, scalp_allocation, reserve_allocation,
+            min_order_size, max_positions_grid, max_positions_scalp)
+
+# Профиль распределения капитала для диапазона сумм [lo, hi)
+AllocProfile = namedtuple('AllocProfile', 'name lo hi grid scalp reserve')
+
+# Записи без __dict__: dataclass(slots=True) доступен начиная с Python 3.10
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(**_DATACLASS_SLOTS)
 class UserCapital:
     """Информация о капитале пользователя"""
     user_id: int
@@ -28,10 +109,15 @@ class UserCapital:
     active_in_grid: float
     active_in_scalp: float
     currencies: Dict[str, float]  # {currency: amount}
-    last_update: datetime
+    last_update: float  # time.monotonic()
     risk_level: str  # 'conservative', 'balanced', 'aggressive'
+    
+    @property
+    def last_update_datetime(self) -> datetime:
+        """Время обновления как datetime (для отображения)"""
+        return datetime.fromtimestamp(time.time() - (time.monotonic() - self.last_update))
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class BalanceAllocation:
     """Распределение баланса для стратегий"""
     grid_allocation: float
@@ -40,7 +126,7 @@ class BalanceAllocation:
     min_order_size: float
     max_positions_grid: int
     max_positions_scalp: int
-    recommended_pairs: List[str]
+    recommended_pairs: Sequence[str]
 
 class AdaptiveBalanceManager:
     """
@@ -60,8 +146,41 @@ class AdaptiveBalanceManager:
         self.config = config
         self.logger = logging.getLogger(__name__)
         
-        # Кэш балансов пользователей
-        self.user_capitals: Dict[int, UserCapital] = {}
+        # Режим работы определяется один раз при создании менеджера
+        self._demo_mode = os.getenv('DEMO_MODE', 'false').lower() == 'true'
+        
+        # Кэш балансов пользователей (LRU: последние использованные в конце)
+        self.user_capitals: Dict[int, UserCapital] = OrderedDict()
+        self.max_cached_users = 10000
+        
+        # Копия числовых полей user_capitals по столбцам (строка на пользователя)
+        # для агрегатов по всем пользователям без перебора объектов
+        self._uids = np.empty(0, np.int64)
+        self._totals = np.empty(0, np.float64)
+        self._grid_active = np.empty(0, np.float64)
+        self._scalp_active = np.empty(0, np.float64)
+        self._row_of: Dict[int, int] = {}
+        
+        # Общий для всех пользователей кэш цен: symbol -> (price, time.monotonic());
+        # price = None - пару не удалось оценить, до истечения TTL ее не запрашиваем
+        self.ticker_cache_ttl = 5.0
+        self._price_cache: Dict[str, Tuple[Optional[float], float]] = {}
+        self._price_inflight: Dict[str, asyncio.Future] = {}
+        
+        # Блокировки обновления капитала: один запрос к бирже на пользователя одновременно
+        self._user_locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        
+        # Выполняющиеся проверки баланса: user_id -> задача check_balance_changes
+        self._refresh_inflight: Dict[int, asyncio.Future] = {}
+        
+        # Рассчитанные распределения: user_id -> (total_balance_usd, BalanceAllocation)
+        self._allocation_cache: Dict[int, Tuple[float, BalanceAllocation]] = {}
+        
+        # Сериализованные сводки: user_id -> ((last_update, grid, scalp), JSON bytes)
+        self._summary_cache: Dict[int, Tuple[Tuple[float, float, float], bytes]] = {}
+        
+        # Текущие торговые пары пользователей: user_id -> (time.monotonic(), pairs)
+        self._current_pairs_cache: Dict[int, Tuple[float, List[str]]] = {}
         
         # Настройки системы
         self.cache_ttl = 60  # Кэш на 1 минуту
@@ -81,6 +200,22 @@ class AdaptiveBalanceManager:
             'whale': {'range': (10000, float('inf')), 'grid': 0.75, 'scalp': 0.15, 'reserve': 0.10}
         }
         
+        # Профили, отсортированные по верхней границе диапазона, для поиска через bisect
+        self._profiles = tuple(sorted(
+            (AllocProfile(name, profile['range'][0], profile['range'][1],
+                          profile['grid'], profile['scalp'], profile['reserve'])
+             for name, profile in self.allocation_profiles.items()),
+            key=lambda profile: profile.hi
+        ))
+        self._profile_by_name = {profile.name: profile for profile in self._profiles}
+        self._profile_uppers = [profile.hi for profile in self._profiles]
+        self._profile_uppers_array = np.array(self._profile_uppers, np.float64)
+        self._profile_lowers_array = np.array([profile.lo for profile in self._profiles], np.float64)
+        
+        if NUMBA_AVAILABLE:
+            # Прогрев JIT, чтобы первый реальный расчет не ждал компиляции
+            _compute_allocation(100.0, 0.50, 0.35, 0.15, 50.0, 30.0)
+        
         self.logger.info("🚀 Adaptive Balance Manager v3.0 инициализирован")
     
     async def get_user_capital(self, user_id: int, force_refresh: bool = False) -> UserCapital:
@@ -98,23 +233,29 @@ class AdaptiveBalanceManager:
         # Проверяем кэш
         if not force_refresh and user_id in self.user_capitals:
             cached = self.user_capitals[user_id]
-            if (datetime.now() - cached.last_update).total_seconds() < self.cache_ttl:
+            if time.monotonic() - cached.last_update < self.cache_ttl:
+                self.user_capitals.move_to_end(user_id)
                 return cached
         
-        try:
-            # Проверяем режим работы
-            is_demo_mode = os.getenv('DEMO_MODE', 'false').lower() == 'true'
+        requested_at = time.monotonic()
+        async with self._user_locks[user_id]:
+            # Пока ждали блокировку, капитал мог обновить другой вызов
+            cached = self.user_capitals.get(user_id)
+            if cached is not None and (
+                cached.last_update >= requested_at or
+                (not force_refresh and time.monotonic() - cached.last_update < self.cache_ttl)
+            ):
+                self.user_capitals.move_to_end(user_id)
+                return cached
             
-            if is_demo_mode:
+            return await self._fetch_user_capital(user_id)
+    
+    async def _fetch_user_capital(self, user_id: int) -> UserCapital:
+        """Запрос баланса пользователя с биржи и сохранение в кэш"""
+        try:
+            if self._demo_mode:
                 # Виртуальный режим - используем фиксированный баланс $1,471.28
-                balance_data = {
-                    'total': {
-                        'USDT': 1471.28,
-                        'BTC': 0.0,
-                        'ETH': 0.0,
-                        'BNB': 0.0
-                    }
-                }
+                balance_data = _DEMO_BALANCE
                 self.logger.info("🎮 Используется виртуальный баланс $1,471.28")
             else:
                 # Получаем балансы с биржи
@@ -123,6 +264,7 @@ class AdaptiveBalanceManager:
             # Рассчитываем общий баланс в USD
             total_usd = 0.0
             currencies = {}
+            to_convert = []
             
             for currency, amounts in balance_data['total'].items():
                 if amounts > 0:
@@ -131,14 +273,16 @@ class AdaptiveBalanceManager:
                     if currency == 'USDT':
                         total_usd += amounts
                     else:
-                        # Конвертируем в USD через USDT пару
-                        try:
-                            ticker = await self.exchange.fetch_ticker(f"{currency}/USDT")
-                            usd_value = amounts * ticker['last']
-                            total_usd += usd_value
-                        except:
-                            # Если не можем получить цену, пропускаем
-                            pass
+                        to_convert.append((currency, amounts))
+            
+            # Конвертируем в USD через USDT пары
+            prices = await self._fetch_prices([f"{currency}/USDT" for currency, _ in to_convert])
+            for currency, amounts in to_convert:
+                price = prices.get(f"{currency}/USDT")
+                if price is None:
+                    # Если не можем получить цену, пропускаем
+                    continue
+                total_usd += amounts * price
             
             # Определяем уровень риска пользователя
             risk_level = self._determine_risk_level(user_id, total_usd)
@@ -152,18 +296,25 @@ class AdaptiveBalanceManager:
                 active_in_grid=0.0,  # Будет обновлено позже
                 active_in_scalp=0.0,  # Будет обновлено позже
                 currencies=currencies,
-                last_update=datetime.now(),
+                last_update=time.monotonic(),
                 risk_level=risk_level
             )
             
             # Сохраняем в кэш
-            self.user_capitals[user_id] = user_capital
+            self._store_capital(user_capital)
             
-            self.logger.info(f"💰 Капитал пользователя {user_id}: ${total_usd:.2f}")
+            self.logger.info("💰 Капитал пользователя %s: $%.2f", user_id, total_usd)
             return user_capital
             
         except Exception as e:
-            self.logger.error(f"❌ Ошибка получения капитала пользователя {user_id}: {e}")
+            self.logger.error("❌ Ошибка получения капитала пользователя %s: %s", user_id, e)
+            
+            # Сбой обновления (например, ошибка оценки одной из валют) не обнуляет
+            # известный капитал: нулевой баланс понизил бы профиль и вызвал
+            # ложные уведомления о снятии средств
+            cached = self.user_capitals.get(user_id)
+            if cached is not None:
+                return cached
             
             # Возвращаем пустой капитал
             return UserCapital(
@@ -174,10 +325,147 @@ class AdaptiveBalanceManager:
                 active_in_grid=0.0,
                 active_in_scalp=0.0,
                 currencies={},
-                last_update=datetime.now(),
+                last_update=time.monotonic(),
                 risk_level='conservative'
             )
     
+    async def _fetch_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """
+        Последние цены для списка пар
+        
+        Цены хранятся в общем для всех пользователей кэше на ticker_cache_ttl
+        секунд. Если цену пары уже запрашивает другой вызов, ждем его результат
+        вместо повторного запроса к бирже.
+        """
+        prices: Dict[str, float] = {}
+        to_fetch: List[str] = []
+        waiting: Dict[str, asyncio.Future] = {}
+        now = time.monotonic()
+        
+        for symbol in dict.fromkeys(symbols):
+            cached = self._price_cache.get(symbol)
+            if cached is not None and now - cached[1] < self.ticker_cache_ttl:
+                if cached[0] is not None:
+                    prices[symbol] = cached[0]
+            elif symbol in self._price_inflight:
+                waiting[symbol] = self._price_inflight[symbol]
+            else:
+                to_fetch.append(symbol)
+        
+        if to_fetch:
+            loop = asyncio.get_running_loop()
+            futures = {symbol: loop.create_future() for symbol in to_fetch}
+            self._price_inflight.update(futures)
+            fetched: Dict[str, float] = {}
+            try:
+                fetched = await self._fetch_tickers(to_fetch)
+                stamp = time.monotonic()
+                for symbol in to_fetch:
+                    self._price_cache[symbol] = (fetched.get(symbol), stamp)
+                prices.update(fetched)
+            finally:
+                for symbol, future in futures.items():
+                    self._price_inflight.pop(symbol, None)
+                    future.set_result(fetched.get(symbol))
+        
+        for symbol, future in waiting.items():
+            price = await future
+            if price is not None:
+                prices[symbol] = price
+        
+        return prices
+    
+    async def _fetch_tickers(self, symbols: List[str]) -> Dict[str, float]:
+        """
+        Запрос цен с биржи
+        
+        Если биржа поддерживает fetchTickers, все цены берутся одним запросом,
+        иначе тикеры запрашиваются параллельно по одному.
+        """
+        tickers: Dict[str, Any] = {}
+        has = getattr(self.exchange, 'has', None) or {}
+        if has.get('fetchTickers'):
+            try:
+                tickers = await self.exchange.fetch_tickers(symbols)
+            except ccxt.BaseError as e:
+                # Например, одна неизвестная пара ломает весь пакет - запросим по одной
+                self.logger.debug("Пакетный запрос тикеров не удался: %s", e)
+        
+        if not tickers:
+            results = await asyncio.gather(
+                *(self.exchange.fetch_ticker(symbol) for symbol in symbols),
+                return_exceptions=True
+            )
+            for symbol, ticker in zip(symbols, results):
+                if isinstance(ticker, ccxt.BaseError):
+                    # Ошибки биржи (нет пары, таймаут) - пару пропускаем
+                    self.logger.debug("Не удалось получить цену %s: %s", symbol, ticker)
+                elif isinstance(ticker, BaseException):
+                    raise ticker
+                else:
+                    tickers[symbol] = ticker
+        
+        return {symbol: ticker['last'] for symbol, ticker in tickers.items()
+                if ticker and ticker.get('last') is not None}
+    
+    def _store_capital(self, capital: UserCapital):
+        """Сохранение капитала в кэш с вытеснением давно не использованных пользователей"""
+        self.user_capitals[capital.user_id] = capital
+        self.user_capitals.move_to_end(capital.user_id)
+        self._sync_capital_row(capital)
+        self._allocation_cache.pop(capital.user_id, None)
+        
+        # Пользователей с активными распределениями не вытесняем, а переносим в конец,
+        # чтобы не потерять учет выделенного капитала
+        for _ in range(len(self.user_capitals)):
+            if len(self.user_capitals) <= self.max_cached_users:
+                break
+            user_id, oldest = self.user_capitals.popitem(last=False)
+            if oldest.active_in_grid + oldest.active_in_scalp > 0:
+                self.user_capitals[user_id] = oldest
+                continue
+            self._drop_capital_row(user_id)
+            self._current_pairs_cache.pop(user_id, None)
+            self._allocation_cache.pop(user_id, None)
+            self._summary_cache.pop(user_id, None)
+            lock = self._user_locks.get(user_id)
+            if lock is not None and not lock.locked():
+                del self._user_locks[user_id]
+    
+    def _drop_capital_row(self, user_id: int):
+        """Удаление строки пользователя из столбцовой копии кэша (на ее место встает последняя)"""
+        row = self._row_of.pop(user_id, None)
+        if row is None:
+            return
+        
+        last = len(self._row_of)
+        if row != last:
+            moved_user_id = int(self._uids[last])
+            self._uids[row] = moved_user_id
+            self._totals[row] = self._totals[last]
+            self._grid_active[row] = self._grid_active[last]
+            self._scalp_active[row] = self._scalp_active[last]
+            self._row_of[moved_user_id] = row
+    
+    def _sync_capital_row(self, capital: UserCapital):
+        """Обновление строки пользователя в столбцовой копии кэша"""
+        row = self._row_of.get(capital.user_id)
+        if row is None:
+            row = len(self._row_of)
+            if row == len(self._uids):
+                # Удваиваем емкость массивов
+                capacity = max(64, 2 * row)
+                self._uids = np.resize(self._uids, capacity)
+                self._totals = np.resize(self._totals, capacity)
+                self._grid_active = np.resize(self._grid_active, capacity)
+                self._scalp_active = np.resize(self._scalp_active, capacity)
+            self._row_of[capital.user_id] = row
+            self._uids[row] = capital.user_id
+        
+        self._totals[row] = capital.total_balance_usd
+        self._grid_active[row] = capital.active_in_grid
+        self._scalp_active[row] = capital.active_in_scalp
+    
     def get_optimal_allocation(self, user_capital: UserCapital) -> BalanceAllocation:
         """
         Получение оптимального распределения капитала
@@ -194,38 +482,15 @@ class AdaptiveBalanceManager:
         # Определяем профиль пользователя
         profile = self._get_allocation_profile(total_balance)
         
-        # Базовое распределение
-        grid_allocation = total_balance * profile['grid']
-        scalp_allocation = total_balance * profile['scalp']
-        reserve_allocation = total_balance * profile['reserve']
-        
-        # Адаптируем под минимальные пороги
-        if grid_allocation < self.min_grid_balance:
-            # Недостаточно для Grid - отдаем все Scalp
-            scalp_allocation += grid_allocation
-            grid_allocation = 0.0
-            
-        if scalp_allocation < self.min_scalp_balance:
-            # Недостаточно для Scalp - отдаем все Grid
-            grid_allocation += scalp_allocation
-            scalp_allocation = 0.0
-        
-        # Рассчитываем параметры торговли
-        min_order_size = max(10.0, total_balance * 0.02)  # Минимум $10 или 2% от баланса
-        
-        # Количество позиций зависит от суммы
-        max_positions_grid = min(20, max(3, int(grid_allocation / 200)))
-        max_positions_scalp = min(10, max(2, int(scalp_allocation / 100)))
+        (grid_allocation, scalp_allocation, reserve_allocation,
+         min_order_size, max_positions_grid, max_positions_scalp) = _compute_allocation(
+            float(total_balance), profile.grid, profile.scalp, profile.reserve,
+            float(self.min_grid_balance), float(self.min_scalp_balance)
+        )
         
         # Рекомендуемые пары в зависимости от суммы
-        if total_balance < 200:
-            recommended_pairs = ["BTC/USDT"]  # Только BTC для малых сумм
-        elif total_balance < 1000:
-            recommended_pairs = ["BTC/USDT", "ETH/USDT"]
-        elif total_balance < 5000:
-            recommended_pairs = ["BTC/USDT", "ETH/USDT", "BNB/USDT"]
-        else:
-            recommended_pairs = ["BTC/USDT", "ETH/USDT", "BNB/USDT", "SOL/USDT", "XRP/USDT"]
+        tier = min(bisect.bisect_right(_PAIR_TIER_BOUNDS, total_balance), len(_PAIR_TIERS) - 1)
+        recommended_pairs = _PAIR_TIERS[tier][1]
         
         return BalanceAllocation(
             grid_allocation=grid_allocation,
@@ -237,15 +502,38 @@ class AdaptiveBalanceManager:
             recommended_pairs=recommended_pairs
         )
     
-    def _get_allocation_profile(self, balance: float) -> Dict[str, float]:
+    def _find_profile(self, balance: float) -> Optional[AllocProfile]:
+        """Профиль, в диапазон которого попадает сумма, или None"""
+        idx = bisect.bisect_right(self._profile_uppers, balance)
+        if idx < len(self._profiles):
+            profile = self._profiles[idx]
+            if profile.lo <= balance:
+                return profile
+        return None
+    
+    def _profile_name_for(self, balance: float) -> Optional[str]:
+        """Имя профиля распределения для суммы (None, если сумма вне диапазонов)"""
+        profile = self._find_profile(balance)
+        return profile.name if profile else None
+    
+    def _get_cached_allocation(self, capital: UserCapital) -> BalanceAllocation:
+        """Распределение для капитала пользователя, пересчитывается только при изменении баланса"""
+        cached = self._allocation_cache.get(capital.user_id)
+        if cached is not None and cached[0] == capital.total_balance_usd:
+            return cached[1]
+        
+        allocation = self.get_optimal_allocation(capital)
+        self._allocation_cache[capital.user_id] = (capital.total_balance_usd, allocation)
+        return allocation
+    
+    def _get_allocation_profile(self, balance: float) -> AllocProfile:
         """Получение профиля распределения для суммы"""
-        for profile_name, profile_data in self.allocation_profiles.items():
-            min_range, max_range = profile_data['range']
-            if min_range <= balance < max_range:
-                return profile_data
+        profile = self._find_profile(balance)
+        if profile:
+            return profile
         
         # Fallback для очень больших сумм
-        return self.allocation_profiles['whale']
+        return self._profile_by_name['whale']
     
     def _determine_risk_level(self, user_id: int, balance: float) -> str:
         """Определение уровня риска пользователя"""
@@ -260,9 +548,23 @@ class AdaptiveBalanceManager:
         """
         Проверка изменений баланса и уведомления о новых возможностях
         
+        Одновременные проверки одного пользователя объединяются: все вызовы
+        ждут одну и ту же проверку и один запрос к бирже.
+        
         Returns:
             Dict с информацией об изменениях и рекомендациях
         """
+        task = self._refresh_inflight.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._check_balance_changes(user_id))
+            self._refresh_inflight[user_id] = task
+            task.add_done_callback(lambda _: self._refresh_inflight.pop(user_id, None))
+        
+        # shield: отмена одного из ожидающих не отменяет общую проверку
+        return await asyncio.shield(task)
+    
+    async def _check_balance_changes(self, user_id: int) -> Dict[str, Any]:
+        """Проверка изменений баланса (без объединения вызовов)"""
         
         # Получаем текущий капитал
         current_capital = await self.get_user_capital(user_id, force_refresh=True)
@@ -302,12 +604,12 @@ class AdaptiveBalanceManager:
         old_profile = self._get_allocation_profile(previous_capital.total_balance_usd)
         new_profile = self._get_allocation_profile(current_capital.total_balance_usd)
         
-        if old_profile != new_profile:
+        if old_profile.name != new_profile.name:
             result["notifications"].append({
                 "type": "profile_change",
                 "message": f"📊 Ваш профиль изменился! Новые стратегии доступны!",
-                "old_profile": old_profile,
-                "new_profile": new_profile
+                "old_profile": self.allocation_profiles[old_profile.name],
+                "new_profile": self.allocation_profiles[new_profile.name]
             })
         
         return result
@@ -315,16 +617,18 @@ class AdaptiveBalanceManager:
     def _get_deposit_recommendations(self, capital: UserCapital) -> List[str]:
         """Рекомендации при пополнении"""
         recommendations = []
-        allocation = self.get_optimal_allocation(capital)
+        allocation = self._get_cached_allocation(capital)
+        grid_allocation = allocation.grid_allocation
+        scalp_allocation = allocation.scalp_allocation
         
-        if allocation.grid_allocation >= self.min_grid_balance and capital.active_in_grid == 0:
-            recommendations.append(f"🔄 Теперь доступен Grid Bot! Рекомендуем ${allocation.grid_allocation:.0f}")
+        if grid_allocation >= self.min_grid_balance and capital.active_in_grid == 0:
+            recommendations.append(f"🔄 Теперь доступен Grid Bot! Рекомендуем ${grid_allocation:.0f}")
         
-        if allocation.scalp_allocation >= self.min_scalp_balance and capital.active_in_scalp == 0:
-            recommendations.append(f"⚡ Теперь доступен Scalp Bot! Рекомендуем ${allocation.scalp_allocation:.0f}")
+        if scalp_allocation >= self.min_scalp_balance and capital.active_in_scalp == 0:
+            recommendations.append(f"⚡ Теперь доступен Scalp Bot! Рекомендуем ${scalp_allocation:.0f}")
         
-        if len(allocation.recommended_pairs) > len(self._get_current_pairs(capital.user_id)):
-            new_pairs = len(allocation.recommended_pairs) - len(self._get_current_pairs(capital.user_id))
+        new_pairs = len(allocation.recommended_pairs) - len(self._get_current_pairs(capital.user_id))
+        if new_pairs > 0:
             recommendations.append(f"📈 Доступно {new_pairs} новых торговых пар!")
         
         return recommendations
@@ -332,21 +636,31 @@ class AdaptiveBalanceManager:
     def _get_reduction_recommendations(self, capital: UserCapital) -> List[str]:
         """Рекомендации при уменьшении баланса"""
         recommendations = []
-        allocation = self.get_optimal_allocation(capital)
+        total_balance = capital.total_balance_usd
         
-        if capital.total_balance_usd < self.min_grid_balance:
+        if total_balance < self.min_grid_balance:
             recommendations.append("⚠️ Рекомендуем остановить Grid Bot - недостаточно средств")
         
-        if capital.total_balance_usd < self.min_scalp_balance:
+        if total_balance < self.min_scalp_balance:
             recommendations.append("⚠️ Рекомендуем остановить Scalp Bot - недостаточно средств")
         
-        if capital.total_balance_usd < self.min_total_balance:
+        if total_balance < self.min_total_balance:
             recommendations.append("🚨 Критически низкий баланс! Рекомендуем пополнить счет")
         
         return recommendations
     
     def _get_current_pairs(self, user_id: int) -> List[str]:
-        """Получение текущих торговых пар пользователя"""
+        """Получение текущих торговых пар пользователя (кэш на cache_ttl секунд)"""
+        cached = self._current_pairs_cache.get(user_id)
+        if cached is not None and time.monotonic() - cached[0] < self.cache_ttl:
+            return cached[1]
+        
+        pairs = self._load_current_pairs(user_id)
+        self._current_pairs_cache[user_id] = (time.monotonic(), pairs)
+        return pairs
+    
+    def _load_current_pairs(self, user_id: int) -> List[str]:
+        """Загрузка текущих торговых пар пользователя"""
         # Заглушка - в реальности будет получать из активных позиций
         return ["BTC/USDT"]
     
@@ -355,6 +669,34 @@ class AdaptiveBalanceManager:
         if user_id in self.user_capitals:
             self.user_capitals[user_id].active_in_grid = grid_active
             self.user_capitals[user_id].active_in_scalp = scalp_active
+            self._sync_capital_row(self.user_capitals[user_id])
+    
+    def get_balance_summary_bytes(self, user_id: int) -> bytes:
+        """
+        Сводка по балансу, сериализованная в JSON (UTF-8)
+        
+        Пока капитал пользователя и его активные распределения не менялись,
+        возвращаются ранее сериализованные байты без построения словаря.
+        """
+        capital = self.user_capitals.get(user_id)
+        if capital is None:
+            return self._dump_json(self.get_balance_summary(user_id))
+        
+        key = (capital.last_update, capital.active_in_grid, capital.active_in_scalp)
+        cached = self._summary_cache.get(user_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        payload = self._dump_json(self.get_balance_summary(user_id))
+        self._summary_cache[user_id] = (key, payload)
+        return payload
+    
+    @staticmethod
+    def _dump_json(data: Dict[str, Any]) -> bytes:
+        """Сериализация в JSON: orjson, если установлен, иначе стандартный json"""
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(data)
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
     
     def get_balance_summary(self, user_id: int) -> Dict[str, Any]:
         """Получение краткой сводки по балансу"""
@@ -362,15 +704,10 @@ class AdaptiveBalanceManager:
             return {"error": "Данные о капитале не найдены"}
         
         capital = self.user_capitals[user_id]
-        allocation = self.get_optimal_allocation(capital)
+        allocation = self._get_cached_allocation(capital)
         
         # Определяем профиль пользователя
-        profile_name = None
-        for name, profile in self.allocation_profiles.items():
-            min_range, max_range = profile['range']
-            if min_range <= capital.total_balance_usd < max_range:
-                profile_name = name
-                break
+        profile_name = self._profile_name_for(capital.total_balance_usd)
         
         return {
             "user_id": user_id,
@@ -419,7 +756,7 @@ class AdaptiveBalanceManager:
             return False, "Данные о капитале не найдены"
         
         capital = self.user_capitals[user_id]
-        allocation = self.get_optimal_allocation(capital)
+        allocation = self._get_cached_allocation(capital)
         
         if strategy == 'grid':
             max_available = allocation.grid_allocation - capital.active_in_grid
@@ -442,7 +779,7 @@ class AdaptiveBalanceManager:
         can_allocate, reason = self.can_allocate(user_id, strategy, amount)
         
         if not can_allocate:
-            self.logger.warning(f"❌ Невозможно выделить ${amount:.2f} для {strategy}: {reason}")
+            self.logger.warning("❌ Невозможно выделить $%.2f для %s: %s", amount, strategy, reason)
             return False
         
         # Обновляем активные распределения
@@ -450,8 +787,9 @@ class AdaptiveBalanceManager:
             self.user_capitals[user_id].active_in_grid += amount
         elif strategy == 'scalp':
             self.user_capitals[user_id].active_in_scalp += amount
+        self._sync_capital_row(self.user_capitals[user_id])
         
-        self.logger.info(f"✅ Выделено ${amount:.2f} для {strategy} пользователю {user_id}")
+        self.logger.info("✅ Выделено $%.2f для %s пользователю %s", amount, strategy, user_id)
         return True
     
     async def release_capital(self, user_id: int, strategy: str, amount: float) -> bool:
@@ -465,27 +803,30 @@ class AdaptiveBalanceManager:
         elif strategy == 'scalp':
             self.user_capitals[user_id].active_in_scalp = max(0, 
                 self.user_capitals[user_id].active_in_scalp - amount)
+        self._sync_capital_row(self.user_capitals[user_id])
         
-        self.logger.info(f"✅ Освобождено ${amount:.2f} от {strategy} пользователя {user_id}")
+        self.logger.info("✅ Освобождено $%.2f от %s пользователя %s", amount, strategy, user_id)
         return True
     
     def get_system_stats(self) -> Dict[str, Any]:
         """Статистика всей системы управления балансами"""
         total_users = len(self.user_capitals)
-        total_capital = sum(cap.total_balance_usd for cap in self.user_capitals.values())
-        total_active = sum(cap.active_in_grid + cap.active_in_scalp for cap in self.user_capitals.values())
-        
-        profile_distribution = {}
-        for capital in self.user_capitals.values():
-            profile = None
-            for name, profile_data in self.allocation_profiles.items():
-                min_range, max_range = profile_data['range']
-                if min_range <= capital.total_balance_usd < max_range:
-                    profile = name
-                    break
-            
-            if profile:
-                profile_distribution[profile] = profile_distribution.get(profile, 0) + 1
+        
+        # Агрегаты считаются по столбцовой копии кэша
+        rows = len(self._row_of)
+        totals = self._totals[:rows]
+        total_capital = float(totals.sum())
+        total_active = float(self._grid_active[:rows].sum() + self._scalp_active[:rows].sum())
+        
+        # Профиль каждой строки: первая верхняя граница больше суммы, с проверкой нижней
+        idx = np.searchsorted(self._profile_uppers_array, totals, side='right')
+        in_range = idx < len(self._profiles)
+        in_range[in_range] = totals[in_range] >= self._profile_lowers_array[idx[in_range]]
+        counts = np.bincount(idx[in_range], minlength=len(self._profiles))
+        profile_distribution = {
+            profile.name: int(count)
+            for profile, count in zip(self._profiles, counts) if count
+        }
         
         return {
             "total_users": total_users,
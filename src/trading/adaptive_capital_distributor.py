@@ -6,14 +6,25 @@ Adaptive Capital Distributor - адаптивная система распре
 """
 
 import asyncio
+import bisect
+import functools
 import time
 import json
+import sys
+from collections import OrderedDict, deque
+from itertools import islice
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 from enum import Enum
 
+import numpy as np
+
 from src.core.log_helper import build_logger
+from ._indicator_jit import _vol_loop, _atr_loop, _rsi_loop
+
+# Записи без __dict__: dataclass(slots=True) доступен начиная с Python 3.10
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
 
 class TradingMode(Enum):
     """Режимы торговли"""
@@ -21,7 +32,7 @@ class TradingMode(Enum):
     AGGRESSIVE = "aggressive"     # 2-3 пары, $200+ на пару, просадка до 8%
     AUTOMATIC = "automatic"       # Бот выбирает на основе капитала
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class PairAnalysis:
     """Анализ торговой пары"""
     symbol: str
@@ -35,7 +46,7 @@ class PairAnalysis:
     risk_score: float  # Общий риск (0-1)
     profit_potential: float  # Потенциал прибыли (0-1)
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class CapitalAllocation:
     """Распределение капитала"""
     symbol: str
@@ -51,6 +62,10 @@ class CapitalAllocation:
 class AdaptiveCapitalDistributor:
     """Адаптивный распределитель капитала с плавающим профитом"""
     
+    # Количество пар по порогам капитала (bisect по верхним границам)
+    _PAIR_COUNT_BOUNDS = (800, 1500, 3000)
+    _PAIR_COUNTS = (1, 2, 3, 4)
+    
     def __init__(self, exchange, user_id: int, config: Dict[str, Any]):
         self.ex = exchange
         self.user_id = user_id
@@ -85,6 +100,18 @@ class AdaptiveCapitalDistributor:
             }
         }
         
+        # Те же настройки по строковому значению режима - поиск по интернированной строке
+        self._mode_cfg: Dict[str, Dict[str, Any]] = {
+            mode.value: mode_config for mode, mode_config in self.trading_modes.items()
+        }
+        
+        # Кэш общего капитала: (monotonic-время, сумма USDT)
+        self._capital_cache: Optional[Tuple[float, float]] = None
+        self._capital_cache_ttl = 5.0
+        
+        # Веса приоритета пар при распределении: лучшая пара 1.2, остальные 0.8
+        self._priority_weights = np.array([1.2] + [0.8] * 15)
+        
         # Настройки плавающего профита
         self.floating_profit_config = {
             'min_profit_for_trailing': 50.0,  # Минимальная прибыль для активации трейлинга
@@ -94,13 +121,28 @@ class AdaptiveCapitalDistributor:
             'reinvestment_threshold': 200.0   # Порог для реинвестирования
         }
         
-        # Кэш анализа пар
-        self._pair_analysis_cache = {}
+        # Кэш анализа пар: symbol -> (monotonic-время, PairAnalysis, свечи), LRU с TTL
+        self._pair_analysis_cache: OrderedDict = OrderedDict()
         self._cache_ttl = 3600  # 1 час
+        self._pair_cache_maxsize = 512
         
-        # История распределения
-        self._allocation_history = []
-        self._profit_tracking = {}
+        # Матрица корреляций доходностей проанализированных пар
+        self._corr_matrix = np.zeros((0, 0))
+        self._symbol_index: Dict[str, int] = {}
+        
+        # Ограничение параллельных запросов свечей к бирже
+        self._max_concurrent_fetches = 8
+        self._fetch_semaphore = None
+        
+        # История распределения (последние записи, фиксированный объем памяти)
+        self._allocation_history: deque = deque(maxlen=256)
+        
+        # Плавающий профит по символам: столбцовые массивы, строка на символ
+        self._symbol_to_row: Dict[str, int] = {}
+        self._entry_price = np.zeros(256)
+        self._max_profit = np.zeros(256)
+        self._trailing_active = np.zeros(256, dtype=bool)
+        self._partial_closed = np.zeros(256, dtype=bool)
         
         # Адаптивные пороги
         self._adaptive_thresholds = {
@@ -109,63 +151,151 @@ class AdaptiveCapitalDistributor:
             'balance_1500_3000': {'pairs': 3, 'min_capital': 200},
             'balance_3000_plus': {'pairs': 4, 'min_capital': 200}
         }
+        
+        # Базовые пороги капитала - увеличены лимиты пар
+        self._capital_tiers = (
+            {'min': 0, 'max': 400, 'tier': 'micro', 'pairs': 2, 'min_capital': 200, 'risk': 'low'},
+            {'min': 400, 'max': 800, 'tier': 'small', 'pairs': 3, 'min_capital': 200, 'risk': 'low'},
+            {'min': 800, 'max': 1500, 'tier': 'medium', 'pairs': 4, 'min_capital': 200, 'risk': 'medium'},
+            {'min': 1500, 'max': 3000, 'tier': 'large', 'pairs': 5, 'min_capital': 200, 'risk': 'medium'},
+            {'min': 3000, 'max': 5000, 'tier': 'xlarge', 'pairs': 6, 'min_capital': 200, 'risk': 'high'},
+            {'min': 5000, 'max': float('inf'), 'tier': 'mega', 'pairs': 8, 'min_capital': 200, 'risk': 'high'}
+        )
+        
+        self._capital_tier_bounds = tuple(tier['max'] for tier in self._capital_tiers[:-1])
+        
+        # Готовые конфигурации тиров: зависят только от тира, поэтому собираются один раз
+        self._tier_configs: Dict[str, Dict[str, Any]] = {
+            tier['tier']: {
+                'tier': tier['tier'],
+                'min_pairs': tier['pairs'],
+                'max_pairs': tier['pairs'],
+                'min_capital_per_pair': tier['min_capital'],
+                'risk_level': tier['risk'],
+                'volatility_range': self._get_volatility_range(tier['risk']),
+                'correlation_limit': self._get_correlation_limit(tier['risk']),
+                'liquidity_threshold': self._get_liquidity_threshold(tier['tier']),
+                'max_drawdown_pct': self._get_drawdown_limit(tier['risk'])
+            }
+            for tier in self._capital_tiers
+        }
+        
+        # Кэш адаптивных конфигураций: (тир, рыночные условия) -> конфигурация
+        self._mode_config_cache: Dict[Tuple[str, Any], Dict[str, Any]] = {}
+        self._mode_config_cache_size = 64
 
     async def analyze_trading_pairs(self, symbols: List[str]) -> List[PairAnalysis]:
         """Анализ торговых пар для отбора"""
         try:
-            current_time = time.time()
-            valid_analyses = []
+            current_time = time.monotonic()
+            cache = self._pair_analysis_cache
+            cached = {}
+            pair_arrays = {}
+            miss_symbols = []
             
             for symbol in symbols:
                 # Проверяем кэш
-                cache_key = f"{symbol}_{current_time // self._cache_ttl}"
-                if cache_key in self._pair_analysis_cache:
-                    analysis = self._pair_analysis_cache[cache_key]
-                    if current_time - analysis.get('timestamp', 0) < self._cache_ttl:
-                        valid_analyses.append(analysis['data'])
+                entry = cache.get(symbol)
+                if entry is not None:
+                    if current_time - entry[0] < self._cache_ttl:
+                        cache.move_to_end(symbol)
+                        cached[symbol] = entry[1]
+                        pair_arrays[symbol] = entry[2]
                         continue
-                
-                # Анализируем пару
-                analysis = await self._analyze_single_pair(symbol)
+                    del cache[symbol]
+                miss_symbols.append(symbol)
+            
+            # Загружаем свечи пар без кэша параллельно
+            arrays = await asyncio.gather(
+                *(self._fetch_ohlcv_array(symbol) for symbol in miss_symbols),
+                return_exceptions=True
+            )
+            
+            for symbol, arr in zip(miss_symbols, arrays):
+                if isinstance(arr, BaseException):
+                    self.logger.error(f"❌ Ошибка анализа пары {symbol}: {arr}")
+                    continue
+                if arr is None:
+                    continue
+                analysis = await self._analyze_ohlcv(symbol, arr)
                 if analysis:
-                    self._pair_analysis_cache[cache_key] = {
-                        'data': analysis,
-                        'timestamp': current_time
-                    }
-                    valid_analyses.append(analysis)
+                    self._cache_pair_analysis(symbol, analysis, arr, current_time)
+                    cached[symbol] = analysis
+                    pair_arrays[symbol] = arr
+            
+            # Корреляция считается по всем парам сразу, поэтому обновляется после анализа
+            self._update_correlation_matrix(list(pair_arrays), list(pair_arrays.values()))
+            for symbol, analysis in cached.items():
+                analysis.correlation = await self._calculate_correlation(symbol, pair_arrays[symbol][:, 4])
+            
+            # Сохраняем исходный порядок символов
+            valid_analyses = [cached[symbol] for symbol in symbols if symbol in cached]
             
             # Сортируем по потенциалу прибыли
             valid_analyses.sort(key=lambda x: x.profit_potential, reverse=True)
             
-            self.logger.info(f"📊 Проанализировано {len(valid_analyses)} пар из {len(symbols)}")
+            self.logger.info("📊 Проанализировано {} пар из {}", len(valid_analyses), len(symbols))
             return valid_analyses
             
         except Exception as e:
             self.logger.error(f"❌ Ошибка анализа пар: {e}")
             return []
 
+    def _cache_pair_analysis(self, symbol: str, analysis: PairAnalysis,
+                             ohlcv: np.ndarray, timestamp: float):
+        """Сохранение анализа пары в кэш с вытеснением самых старых записей"""
+        cache = self._pair_analysis_cache
+        cache[symbol] = (timestamp, analysis, ohlcv)
+        cache.move_to_end(symbol)
+        while len(cache) > self._pair_cache_maxsize:
+            cache.popitem(last=False)
+
     async def _analyze_single_pair(self, symbol: str) -> Optional[PairAnalysis]:
         """Анализ одной торговой пары"""
+        arr = await self._fetch_ohlcv_array(symbol)
+        if arr is None:
+            return None
+        return await self._analyze_ohlcv(symbol, arr)
+
+    async def _fetch_ohlcv_array(self, symbol: str) -> Optional[np.ndarray]:
+        """Получение свечей пары одной матрицей float64 (N, 6)"""
         try:
-            # Получаем данные за 4 часа
-            ohlcv = self.ex.fetch_ohlcv(symbol, '1h', limit=4)
+            # Получаем данные за 4 часа (синхронный CCXT - в пуле потоков)
+            if self._fetch_semaphore is None:
+                self._fetch_semaphore = asyncio.Semaphore(self._max_concurrent_fetches)
+            
+            loop = asyncio.get_running_loop()
+            async with self._fetch_semaphore:
+                ohlcv = await loop.run_in_executor(
+                    None, functools.partial(self.ex.fetch_ohlcv, symbol, '1h', limit=4)
+                )
             if len(ohlcv) < 4:
                 return None
             
+            return np.asarray(ohlcv, dtype=np.float64)
+            
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка анализа пары {symbol}: {e}")
+            return None
+
+    async def _analyze_ohlcv(self, symbol: str, arr: np.ndarray) -> Optional[PairAnalysis]:
+        """Расчет показателей пары по матрице свечей"""
+        try:
+            # Одно транспонирование дает непрерывные столбцы для всех индикаторов
+            _, _, high, low, prices, volumes = np.ascontiguousarray(arr.T)
+            
             # Рассчитываем волатильность
-            prices = [candle[4] for candle in ohlcv]  # Close prices
             volatility = self._calculate_volatility(prices)
             
             # Рассчитываем ликвидность (объем)
-            volumes = [candle[5] for candle in ohlcv]
-            avg_volume = sum(volumes) / len(volumes)
-            liquidity = avg_volume * prices[-1]  # Примерная ликвидность в USD
+            avg_volume = float(volumes.mean())
+            liquidity = avg_volume * float(prices[-1])  # Примерная ликвидность в USD
             
             # Рассчитываем тренд
             trend = self._calculate_trend(prices)
             
             # Рассчитываем ATR
-            atr = self._calculate_atr(ohlcv)
+            atr = self._calculate_atr(high, low, prices)
             
             # Рассчитываем RSI
             rsi = self._calculate_rsi(prices)
@@ -198,32 +328,17 @@ class AdaptiveCapitalDistributor:
             self.logger.error(f"❌ Ошибка анализа пары {symbol}: {e}")
             return None
 
-    def _calculate_volatility(self, prices: List[float]) -> float:
+    def _calculate_volatility(self, prices: np.ndarray) -> float:
         """Расчет волатильности"""
-        if len(prices) < 2:
-            return 0.0
-        
-        returns = []
-        for i in range(1, len(prices)):
-            ret = (prices[i] - prices[i-1]) / prices[i-1]
-            returns.append(ret)
-        
-        if not returns:
-            return 0.0
-        
-        mean_return = sum(returns) / len(returns)
-        variance = sum((r - mean_return) ** 2 for r in returns) / len(returns)
-        volatility = (variance ** 0.5) * 100  # В процентах
-        
-        return volatility
+        return float(_vol_loop(np.ascontiguousarray(prices, dtype=np.float64)))
 
-    def _calculate_trend(self, prices: List[float]) -> float:
+    def _calculate_trend(self, prices: np.ndarray) -> float:
         """Расчет тренда (0-1, где 0.5 = боковой)"""
         if len(prices) < 2:
             return 0.5
         
-        first_price = prices[0]
-        last_price = prices[-1]
+        first_price = float(prices[0])
+        last_price = float(prices[-1])
         price_change = (last_price - first_price) / first_price
         
         # Нормализуем к 0-1 (0.5 = боковой)
@@ -232,66 +347,41 @@ class AdaptiveCapitalDistributor:
         
         return trend
 
-    def _calculate_atr(self, ohlcv: List[List]) -> float:
+    def _calculate_atr(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> float:
         """Расчет Average True Range"""
-        if len(ohlcv) < 2:
-            return 0.0
-        
-        true_ranges = []
-        for i in range(1, len(ohlcv)):
-            high = ohlcv[i][2]
-            low = ohlcv[i][3]
-            prev_close = ohlcv[i-1][4]
-            
-            tr1 = high - low
-            tr2 = abs(high - prev_close)
-            tr3 = abs(low - prev_close)
-            
-            true_range = max(tr1, tr2, tr3)
-            true_ranges.append(true_range)
-        
-        if not true_ranges:
-            return 0.0
-        
-        atr = sum(true_ranges) / len(true_ranges)
-        return atr
+        return float(_atr_loop(np.ascontiguousarray(high, dtype=np.float64),
+                               np.ascontiguousarray(low, dtype=np.float64),
+                               np.ascontiguousarray(close, dtype=np.float64)))
 
-    def _calculate_rsi(self, prices: List[float], period: int = 14) -> float:
+    def _calculate_rsi(self, prices: np.ndarray, period: int = 14) -> float:
         """Расчет RSI"""
-        if len(prices) < period + 1:
-            return 50.0
-        
-        gains = []
-        losses = []
-        
-        for i in range(1, len(prices)):
-            change = prices[i] - prices[i-1]
-            if change > 0:
-                gains.append(change)
-                losses.append(0)
-            else:
-                gains.append(0)
-                losses.append(abs(change))
-        
-        if len(gains) < period:
-            return 50.0
-        
-        avg_gain = sum(gains[-period:]) / period
-        avg_loss = sum(losses[-period:]) / period
-        
-        if avg_loss == 0:
-            return 100.0
-        
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
+        return float(_rsi_loop(np.ascontiguousarray(prices, dtype=np.float64), period))
+
+    def _update_correlation_matrix(self, symbols: List[str], arrays: List[np.ndarray]):
+        """Пересчет матрицы корреляций лог-доходностей по общему окну свечей"""
+        self._symbol_index = {symbol: i for i, symbol in enumerate(symbols)}
+        if not arrays:
+            self._corr_matrix = np.zeros((0, 0))
+            return
+        
+        length = min(arr.shape[0] for arr in arrays)
+        prices = np.vstack([arr[-length:, 4] for arr in arrays])
+        
+        # Пары с неизменной ценой дают NaN - считаем их некоррелированными
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.diff(np.log(prices), axis=1)
+            corr = np.corrcoef(returns)
+        self._corr_matrix = np.nan_to_num(np.atleast_2d(corr))
 
-    async def _calculate_correlation(self, symbol: str, prices: List[float]) -> float:
-        """Расчет корреляции с другими парами (упрощенная версия)"""
-        # В реальной реализации здесь был бы расчет корреляции
-        # с другими парами из кэша анализа
-        return 0.3  # Заглушка
+    async def _calculate_correlation(self, symbol: str, prices: np.ndarray) -> float:
+        """Максимальная по модулю корреляция пары с остальными проанализированными парами"""
+        i = self._symbol_index.get(symbol)
+        if i is None or self._corr_matrix.shape[0] < 2:
+            return 0.0
+        
+        row = np.abs(self._corr_matrix[i])
+        row[i] = 0.0
+        return float(row.max())
 
     def _calculate_risk_score(self, volatility: float, atr: float, rsi: float) -> float:
         """Расчет общего риска (0-1)"""
@@ -332,11 +422,12 @@ class AdaptiveCapitalDistributor:
         """Выбор оптимальных пар для торговли с адаптивной конфигурацией"""
         try:
             # Для режима AUTOMATIC используем адаптивную конфигурацию
-            if mode == TradingMode.AUTOMATIC and total_capital:
+            is_automatic = mode is TradingMode.AUTOMATIC
+            if is_automatic and total_capital:
                 mode_config = self.get_adaptive_mode_config(total_capital)
-                self.logger.info(f"🎯 Используем адаптивную конфигурацию для капитала ${total_capital:.2f}")
+                self.logger.info("🎯 Используем адаптивную конфигурацию для капитала ${:.2f}", total_capital)
             else:
-                mode_config = self.trading_modes[mode]
+                mode_config = self._mode_cfg[mode.value]
             
             selected_pairs = []
             
@@ -346,49 +437,54 @@ class AdaptiveCapitalDistributor:
             correlation_limit = mode_config['correlation_limit']
             
             # Фильтруем по критериям режима
+            # Отсев пар пишется на уровне DEBUG с отложенным форматированием -
+            # на каждом тике это десятки сообщений
+            logger = self.logger
             for analysis in analyses:
-                self.logger.info(f"🔍 Анализируем {analysis.symbol}: волатильность {analysis.volatility:.2f}%, ликвидность ${analysis.liquidity:,.0f}")
+                logger.debug("🔍 Анализируем {}: волатильность {:.2f}%, ликвидность ${:,.0f}",
+                             analysis.symbol, analysis.volatility, analysis.liquidity)
                 
                 # Проверяем волатильность
                 if not (vol_min <= analysis.volatility <= vol_max):
-                    self.logger.warning(f"❌ {analysis.symbol}: волатильность {analysis.volatility:.2f}% не в диапазоне {vol_min}-{vol_max}%")
+                    logger.debug("❌ {}: волатильность {:.2f}% не в диапазоне {}-{}%",
+                                 analysis.symbol, analysis.volatility, vol_min, vol_max)
                     continue
                 
                 # Проверяем ликвидность
                 if analysis.liquidity < min_liquidity:
-                    self.logger.warning(f"❌ {analysis.symbol}: ликвидность ${analysis.liquidity:,.0f} < ${min_liquidity:,.0f}")
+                    logger.debug("❌ {}: ликвидность ${:,.0f} < ${:,.0f}",
+                                 analysis.symbol, analysis.liquidity, min_liquidity)
                     continue
                 
                 # Проверяем корреляцию с уже выбранными
                 if self._check_correlation_limit(analysis, selected_pairs, correlation_limit):
-                    self.logger.warning(f"❌ {analysis.symbol}: корреляция превышает лимит {correlation_limit}")
+                    logger.debug("❌ {}: корреляция превышает лимит {}", analysis.symbol, correlation_limit)
                     continue
                 
                 selected_pairs.append(analysis)
-                self.logger.info(f"✅ {analysis.symbol}: выбрана (волатильность: {analysis.volatility:.2f}%, ликвидность: ${analysis.liquidity:,.0f})")
+                logger.info("✅ {}: выбрана (волатильность: {:.2f}%, ликвидность: ${:,.0f})",
+                            analysis.symbol, analysis.volatility, analysis.liquidity)
                 
                 # Ограничиваем количество пар
                 if len(selected_pairs) >= mode_config['max_pairs']:
                     break
             
             # Fallback для режима automatic - если ни одна пара не подходит
-            if mode == TradingMode.AUTOMATIC and len(selected_pairs) == 0 and len(analyses) > 0:
+            if is_automatic and len(selected_pairs) == 0 and len(analyses) > 0:
                 self.logger.warning("⚠️ Ни одна пара не подходит под адаптивные критерии, используем fallback")
                 # Берем лучшие пары по потенциалу прибыли
                 fallback_pairs = sorted(analyses, key=lambda x: x.profit_potential, reverse=True)
                 selected_pairs = fallback_pairs[:mode_config['max_pairs']]
-                self.logger.info(f"🔄 Fallback: выбрано {len(selected_pairs)} пар по потенциалу прибыли")
+                self.logger.info("🔄 Fallback: выбрано {} пар по потенциалу прибыли", len(selected_pairs))
             
             # Логируем итоговые критерии
-            if mode == TradingMode.AUTOMATIC:
-                self.logger.info(f"🎯 Итоговые критерии для режима AUTOMATIC:")
-                self.logger.info(f"   📊 Волатильность: {mode_config['volatility_range'][0]}-{mode_config['volatility_range'][1]}%")
-                self.logger.info(f"   💰 Ликвидность: >${min_liquidity:,}")
-                self.logger.info(f"   🔗 Корреляция: <{correlation_limit}")
-                self.logger.info(f"   📈 Максимум пар: {mode_config['max_pairs']}")
-                self.logger.info(f"   🎯 Тир капитала: {mode_config.get('tier', 'unknown')}")
-            
-            self.logger.info(f"🎯 Выбрано {len(selected_pairs)} пар для режима {mode.value}")
+            if is_automatic:
+                self.logger.info("🎯 Итоговые критерии для режима AUTOMATIC: волатильность {}-{}%, "
+                                 "ликвидность >${:,}, корреляция <{}, максимум пар {}, тир капитала {}",
+                                 vol_min, vol_max, min_liquidity, correlation_limit,
+                                 mode_config['max_pairs'], mode_config.get('tier', 'unknown'))
+            
+            self.logger.info("🎯 Выбрано {} пар для режима {}", len(selected_pairs), mode.value)
             return selected_pairs
             
         except Exception as e:
@@ -399,10 +495,14 @@ class AdaptiveCapitalDistributor:
                                existing_pairs: List[PairAnalysis], 
                                limit: float) -> bool:
         """Проверка лимита корреляции"""
-        for existing in existing_pairs:
-            if abs(new_pair.correlation - existing.correlation) > limit:
-                return True
-        return False
+        index = self._symbol_index
+        i = index.get(new_pair.symbol)
+        if i is None or not existing_pairs:
+            return False
+        
+        idxs = [index[p.symbol] for p in existing_pairs if p.symbol in index]
+        row = self._corr_matrix[i, idxs]
+        return bool(np.any(np.abs(row) > limit))
 
     async def distribute_capital_adaptively(self, mode: TradingMode, 
                                           selected_pairs: List[PairAnalysis]) -> Dict[str, CapitalAllocation]:
@@ -415,11 +515,11 @@ class AdaptiveCapitalDistributor:
                 return {}
             
             # Для режима AUTOMATIC используем адаптивную конфигурацию
-            if mode == TradingMode.AUTOMATIC:
+            if mode is TradingMode.AUTOMATIC:
                 mode_config = self.get_adaptive_mode_config(total_capital)
-                self.logger.info(f"🎯 Адаптивное распределение для капитала ${total_capital:.2f}")
+                self.logger.info("🎯 Адаптивное распределение для капитала ${:.2f}", total_capital)
             else:
-                mode_config = self.trading_modes[mode]
+                mode_config = self._mode_cfg[mode.value]
             
             # Определяем количество пар на основе конфигурации
             pair_count = mode_config['max_pairs']
@@ -429,26 +529,24 @@ class AdaptiveCapitalDistributor:
             
             # Рассчитываем распределение
             allocations = {}
-            
-            for i, pair in enumerate(pairs_to_use):
-                # Базовое распределение
-                base_allocation = total_capital / len(pairs_to_use)
-                
-                # Приоритет для "лучшей" пары (60/40)
-                if i == 0:
-                    allocation = base_allocation * 1.2
-                else:
-                    allocation = base_allocation * 0.8
-                
-                # Ограничиваем минимальным порогом
-                min_capital = mode_config['min_capital_per_pair']
-                if allocation < min_capital:
-                    allocation = min_capital
-                
-                # Рассчитываем параметры риска
-                risk_level = mode_config.get('risk_level', 'medium')
+            pair_total = len(pairs_to_use)
+            
+            # Приоритет для "лучшей" пары (60/40) и минимальный порог - одной векторной операцией
+            min_capital = mode_config['min_capital_per_pair']
+            weights = self._priority_weights
+            if pair_total > weights.size:
+                weights = np.full(pair_total, weights[-1])
+                weights[0] = self._priority_weights[0]
+            amounts = (np.maximum(total_capital / pair_total * weights[:pair_total], min_capital)
+                       if pair_total else np.empty(0))
+            
+            # Рассчитываем параметры риска
+            risk_level = mode_config.get('risk_level', 'medium')
+            drawdown_frac = mode_config['max_drawdown_pct'] / 100
+            
+            for pair, allocation in zip(pairs_to_use, amounts.tolist()):
                 profit_target = allocation * 0.1  # 10% цель
-                stop_loss = allocation * (mode_config['max_drawdown_pct'] / 100)
+                stop_loss = allocation * drawdown_frac
                 
                 # Создаем распределение
                 allocation_obj = CapitalAllocation(
@@ -465,12 +563,12 @@ class AdaptiveCapitalDistributor:
                 
                 allocations[pair.symbol] = allocation_obj
                 
-                self.logger.info(f"💰 {pair.symbol}: ${allocation:.2f} "
-                               f"(риск: {risk_level}, цель: ${profit_target:.2f})")
+                self.logger.info("💰 {}: ${:.2f} (риск: {}, цель: ${:.2f})",
+                                 pair.symbol, allocation, risk_level, profit_target)
             
             # Сохраняем в историю
             self._allocation_history.append({
-                'timestamp': datetime.now().isoformat(),
+                'timestamp_ns': time.time_ns(),  # В ISO-строку переводится только в сводке
                 'mode': mode.value,
                 'total_capital': total_capital,
                 'tier': mode_config.get('tier', 'unknown'),
@@ -485,16 +583,7 @@ class AdaptiveCapitalDistributor:
 
     def _determine_pair_count(self, total_capital: float, mode: TradingMode) -> int:
         """Определение количества пар на основе капитала"""
-        if total_capital < 400:
-            return 1
-        elif total_capital < 800:
-            return 1
-        elif total_capital < 1500:
-            return 2
-        elif total_capital < 3000:
-            return 3
-        else:
-            return 4
+        return self._PAIR_COUNTS[bisect.bisect_right(self._PAIR_COUNT_BOUNDS, total_capital)]
 
     def _determine_risk_level(self, pair: PairAnalysis, mode: TradingMode) -> str:
         """Определение уровня риска для пары"""
@@ -511,14 +600,23 @@ class AdaptiveCapitalDistributor:
             if not self.ex:
                 return 0.0
             
-            balance = self.ex.fetch_balance({'type': 'spot'})
+            # Баланс между соседними вызовами одного тика не меняется
+            now = time.monotonic()
+            if self._capital_cache is not None and now - self._capital_cache[0] < self._capital_cache_ttl:
+                return self._capital_cache[1]
+            
+            # Синхронный CCXT запрос выполняется в пуле потоков, не блокируя event loop
+            loop = asyncio.get_running_loop()
+            balance = await loop.run_in_executor(None, self.ex.fetch_balance, {'type': 'spot'})
             total_usdt = float(balance.get('total', {}).get('USDT', 0.0))
             
             if total_usdt <= 0:
                 self.logger.warning("⚠️ Общий капитал в USDT равен нулю")
-                return 0.0
+                total_usdt = 0.0
+            else:
+                self.logger.info("💰 Общий капитал: ${:.2f} USDT", total_usdt)
             
-            self.logger.info(f"💰 Общий капитал: ${total_usdt:.2f} USDT")
+            self._capital_cache = (now, total_usdt)
             return total_usdt
             
         except Exception as e:
@@ -529,46 +627,41 @@ class AdaptiveCapitalDistributor:
                                    allocation: CapitalAllocation) -> Dict[str, Any]:
         """Обновление плавающего профита"""
         try:
-            if symbol not in self._profit_tracking:
-                self._profit_tracking[symbol] = {
-                    'entry_price': current_price,
-                    'max_profit': 0.0,
-                    'trailing_active': False,
-                    'partial_closed': False
-                }
+            row = self._symbol_to_row.get(symbol)
+            if row is None:
+                row = self._add_profit_row(symbol, current_price)
             
-            tracking = self._profit_tracking[symbol]
-            entry_price = tracking['entry_price']
+            entry_price = float(self._entry_price[row])
             
             # Рассчитываем текущую прибыль
             current_profit = (current_price - entry_price) / entry_price * allocation.allocated_amount
             
             # Обновляем максимальную прибыль
-            if current_profit > tracking['max_profit']:
-                tracking['max_profit'] = current_profit
+            if current_profit > self._max_profit[row]:
+                self._max_profit[row] = current_profit
             
             # Активируем трейлинг при достижении порога
             if (current_profit >= self.floating_profit_config['min_profit_for_trailing'] and 
-                not tracking['trailing_active']):
-                tracking['trailing_active'] = True
-                self.logger.info(f"🎯 Активирован трейлинг для {symbol} при прибыли ${current_profit:.2f}")
+                not self._trailing_active[row]):
+                self._trailing_active[row] = True
+                self.logger.info("🎯 Активирован трейлинг для {} при прибыли ${:.2f}", symbol, current_profit)
             
             # Частичное закрытие при достижении цели
             if (current_profit >= allocation.profit_target and 
-                not tracking['partial_closed']):
-                tracking['partial_closed'] = True
-                self.logger.info(f"💰 Частичное закрытие {symbol} при прибыли ${current_profit:.2f}")
+                not self._partial_closed[row]):
+                self._partial_closed[row] = True
+                self.logger.info("💰 Частичное закрытие {} при прибыли ${:.2f}", symbol, current_profit)
             
             # Реинвестирование при превышении порога
             if current_profit >= self.floating_profit_config['reinvestment_threshold']:
-                self.logger.info(f"🔄 Реинвестирование {symbol} при прибыли ${current_profit:.2f}")
+                self.logger.info("🔄 Реинвестирование {} при прибыли ${:.2f}", symbol, current_profit)
                 # Здесь можно добавить логику реинвестирования
             
             return {
                 'current_profit': current_profit,
-                'max_profit': tracking['max_profit'],
-                'trailing_active': tracking['trailing_active'],
-                'partial_closed': tracking['partial_closed'],
+                'max_profit': float(self._max_profit[row]),
+                'trailing_active': bool(self._trailing_active[row]),
+                'partial_closed': bool(self._partial_closed[row]),
                 'profit_pct': (current_profit / allocation.allocated_amount) * 100
             }
             
@@ -576,32 +669,65 @@ class AdaptiveCapitalDistributor:
             self.logger.error(f"❌ Ошибка обновления плавающего профита для {symbol}: {e}")
             return {}
 
+    def _add_profit_row(self, symbol: str, entry_price: float) -> int:
+        """Добавление строки отслеживания профита для нового символа"""
+        row = len(self._symbol_to_row)
+        if row == len(self._entry_price):
+            # Удваиваем емкость массивов
+            capacity = 2 * row
+            self._entry_price = np.resize(self._entry_price, capacity)
+            self._max_profit = np.resize(self._max_profit, capacity)
+            self._trailing_active = np.resize(self._trailing_active, capacity)
+            self._partial_closed = np.resize(self._partial_closed, capacity)
+        
+        self._symbol_to_row[symbol] = row
+        self._entry_price[row] = entry_price
+        self._max_profit[row] = 0.0
+        self._trailing_active[row] = False
+        self._partial_closed[row] = False
+        return row
+
     async def get_allocation_summary(self) -> Dict[str, Any]:
         """Получение сводки по распределению"""
         try:
+            history = self._allocation_history
             total_allocated = sum(
-                allocation.allocated_amount 
-                for allocation in self._allocation_history[-1].get('allocations', {}).values()
-            ) if self._allocation_history else 0
-            
-            active_pairs = len(self._profit_tracking)
-            total_profit = sum(
-                tracking.get('max_profit', 0) 
-                for tracking in self._profit_tracking.values()
-            )
+                history[-1].get('allocations', {}).values()
+            ) if history else 0
+            
+            active_pairs = len(self._symbol_to_row)
+            total_profit = float(self._max_profit[:active_pairs].sum())
             
             return {
                 'total_allocated': total_allocated,
                 'active_pairs': active_pairs,
                 'total_profit': total_profit,
-                'allocation_history': self._allocation_history[-5:],  # Последние 5
-                'profit_tracking': self._profit_tracking
+                'allocation_history': [  # Последние 5
+                    self._format_history_entry(entry)
+                    for entry in islice(history, max(0, len(history) - 5), None)
+                ],
+                'profit_tracking': {
+                    symbol: {
+                        'entry_price': float(self._entry_price[row]),
+                        'max_profit': float(self._max_profit[row]),
+                        'trailing_active': bool(self._trailing_active[row]),
+                        'partial_closed': bool(self._partial_closed[row])
+                    }
+                    for symbol, row in self._symbol_to_row.items()
+                }
             }
             
         except Exception as e:
             self.logger.error(f"❌ Ошибка получения сводки: {e}")
             return {}
 
+    @staticmethod
+    def _format_history_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Запись истории распределения с временем в формате ISO"""
+        formatted = {k: v for k, v in entry.items() if k != 'timestamp_ns'}
+        formatted['timestamp'] = datetime.fromtimestamp(entry['timestamp_ns'] / 1e9).isoformat()
+        return formatted
+
     def get_trading_mode_recommendation(self, total_capital: float) -> TradingMode:
         """Рекомендация режима торговли на основе капитала"""
         if total_capital < 800:
@@ -612,52 +738,55 @@ class AdaptiveCapitalDistributor:
             return TradingMode.AGGRESSIVE
 
     def get_adaptive_mode_config(self, total_capital: float, market_conditions: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Адаптивная конфигурация режима на основе капитала и рыночных условий"""
+        """
+        Адаптивная конфигурация режима на основе капитала и рыночных условий
         
-        # Базовые пороги капитала - увеличены лимиты пар
-        capital_tiers = [
-            {'min': 0, 'max': 400, 'tier': 'micro', 'pairs': 2, 'min_capital': 200, 'risk': 'low'},
-            {'min': 400, 'max': 800, 'tier': 'small', 'pairs': 3, 'min_capital': 200, 'risk': 'low'},
-            {'min': 800, 'max': 1500, 'tier': 'medium', 'pairs': 4, 'min_capital': 200, 'risk': 'medium'},
-            {'min': 1500, 'max': 3000, 'tier': 'large', 'pairs': 5, 'min_capital': 200, 'risk': 'medium'},
-            {'min': 3000, 'max': 5000, 'tier': 'xlarge', 'pairs': 6, 'min_capital': 200, 'risk': 'high'},
-            {'min': 5000, 'max': float('inf'), 'tier': 'mega', 'pairs': 8, 'min_capital': 200, 'risk': 'high'}
-        ]
-        
-        # Определяем текущий тир капитала
-        current_tier = None
-        for tier in capital_tiers:
-            if tier['min'] <= total_capital < tier['max']:
-                current_tier = tier
-                break
-        
-        if not current_tier:
-            current_tier = capital_tiers[-1]  # Максимальный тир
-        
-        # Адаптивные настройки на основе тира
-        adaptive_config = {
-            'tier': current_tier['tier'],
-            'min_pairs': current_tier['pairs'],
-            'max_pairs': current_tier['pairs'],
-            'min_capital_per_pair': current_tier['min_capital'],
-            'risk_level': current_tier['risk'],
-            'volatility_range': self._get_volatility_range(current_tier['risk']),
-            'correlation_limit': self._get_correlation_limit(current_tier['risk']),
-            'liquidity_threshold': self._get_liquidity_threshold(current_tier['tier']),
-            'max_drawdown_pct': self._get_drawdown_limit(current_tier['risk'])
-        }
+        Конфигурация зависит только от тира капитала и рыночных условий, поэтому
+        кэшируется по этой паре. Возвращаемый словарь общий - не изменяйте его.
+        """
+        current_tier = self._resolve_capital_tier(total_capital)
+        
+        try:
+            market_key = frozenset(market_conditions.items()) if market_conditions else None
+        except TypeError:
+            # Нехешируемые значения условий - считаем без кэша
+            return self._build_mode_config(current_tier, market_conditions)
+        
+        cache_key = (current_tier['tier'], market_key)
+        adaptive_config = self._mode_config_cache.get(cache_key)
+        if adaptive_config is not None:
+            return adaptive_config
+        
+        adaptive_config = self._build_mode_config(current_tier, market_conditions)
+        if len(self._mode_config_cache) >= self._mode_config_cache_size:
+            self._mode_config_cache.clear()
+        self._mode_config_cache[cache_key] = adaptive_config
+        
+        self.logger.info("🎯 Адаптивная конфигурация для капитала ${:.2f}: тир {}, пар {}-{}, "
+                         "минимум на пару ${}, риск {}, волатильность {}-{}%, ликвидность >${:,}",
+                         total_capital, adaptive_config['tier'],
+                         adaptive_config['min_pairs'], adaptive_config['max_pairs'],
+                         adaptive_config['min_capital_per_pair'], adaptive_config['risk_level'],
+                         adaptive_config['volatility_range'][0], adaptive_config['volatility_range'][1],
+                         adaptive_config['liquidity_threshold'])
+        
+        return adaptive_config
+
+    def _resolve_capital_tier(self, total_capital: float) -> Dict[str, Any]:
+        """Определение тира капитала"""
+        if total_capital < 0:
+            return self._capital_tiers[-1]  # Максимальный тир
+        
+        return self._capital_tiers[bisect.bisect_right(self._capital_tier_bounds, total_capital)]
+
+    def _build_mode_config(self, current_tier: Dict[str, Any],
+                           market_conditions: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Конфигурация режима для тира капитала с учетом рыночных условий"""
+        adaptive_config = self._tier_configs[current_tier['tier']]
         
-        # Адаптация к рыночным условиям
+        # Адаптация к рыночным условиям (на копии готовой конфигурации тира)
         if market_conditions:
-            adaptive_config = self._adapt_to_market_conditions(adaptive_config, market_conditions)
-        
-        self.logger.info(f"🎯 Адаптивная конфигурация для капитала ${total_capital:.2f}:")
-        self.logger.info(f"   📊 Тир: {adaptive_config['tier']}")
-        self.logger.info(f"   📈 Пар: {adaptive_config['min_pairs']}-{adaptive_config['max_pairs']}")
-        self.logger.info(f"   💰 Минимум на пару: ${adaptive_config['min_capital_per_pair']}")
-        self.logger.info(f"   ⚠️ Риск: {adaptive_config['risk_level']}")
-        self.logger.info(f"   📊 Волатильность: {adaptive_config['volatility_range'][0]}-{adaptive_config['volatility_range'][1]}%")
-        self.logger.info(f"   💰 Ликвидность: >${adaptive_config['liquidity_threshold']:,}")
+            adaptive_config = self._adapt_to_market_conditions(dict(adaptive_config), market_conditions)
         
         return adaptive_config
 
@@ -5,12 +5,227 @@ Advanced Signal Generator
 Enhanced Trading System v3.0 Commercial
 """
 
+import math
+from collections import OrderedDict
+
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from loguru import logger
 
+from ._clock import _fast_now
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(**kwargs):
+        """Без numba функция выполняется интерпретатором как есть"""
+        return lambda func: func
+
+# Название сигнала по коду: 1 - BUY, -1 - SELL, 0 - HOLD
+_SIGNAL_NAMES = ('HOLD', 'BUY', 'SELL')
+
+# Общий результат HOLD для горячего пути generate_signal
+_HOLD_RESULT = {'signal': 'HOLD', 'confidence': 0.0}
+
+
+@njit(cache=True, fastmath=True)
+def _tail_sums(close):
+    """Суммы последних 5 и 20 цен закрытия за один проход"""
+    n = close.shape[0]
+    sum5 = 0.0
+    sum20 = 0.0
+    for i in range(n - 20, n):
+        sum20 += close[i]
+        if i >= n - 5:
+            sum5 += close[i]
+    return sum5, sum20
+
+
+@njit(cache=True, fastmath=True)
+def _sma_cross_kernel(sma_short, sma_long):
+    """
+    Решение по пересечению SMA
+    
+    Returns:
+        (код сигнала, уверенность): 1 - BUY, -1 - SELL, 0 - HOLD
+    """
+    # Без ветвлений: код - разность двух сравнений, уверенность обнуляется для HOLD
+    ratio = sma_short / sma_long
+    code = int(ratio > 1.001) - int(ratio < 0.999)
+    confidence = min(0.9, abs(ratio - 1.0) * 100.0) * abs(code)
+    return code, confidence
+
+
+def _sliding_weighted_ma(arr: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Взвешенное скользящее среднее по всем полным окнам длины len(weights)
+    
+    Args:
+        arr: Цены
+        weights: Веса окна (последний вес - самой свежей цене)
+        
+    Returns:
+        Массив длины len(arr) - len(weights) + 1 (пустой, если данных меньше окна)
+    """
+    if arr.shape[0] < weights.shape[0]:
+        return np.empty(0)
+    win = sliding_window_view(arr, weights.shape[0])
+    return np.einsum('ij,j->i', win, weights) / weights.sum()
+
+
+def _padded_weighted_ma(arr: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """_sliding_weighted_ma, дополненная NaN в начале до длины arr"""
+    result = np.full(arr.shape[0], np.nan)
+    ma = _sliding_weighted_ma(arr, weights)
+    result[arr.shape[0] - ma.shape[0]:] = ma
+    return result
+
+
+def _bar_times(data: pd.DataFrame):
+    """
+    Время свечей, однозначно определяющее бар
+    
+    Args:
+        data: Данные свечей
+        
+    Returns:
+        DatetimeIndex или столбец timestamp; None, если времени свечей в данных нет
+        (например, RangeIndex у pd.DataFrame(fetch_ohlcv(...)) без столбца timestamp)
+    """
+    if isinstance(data.index, pd.DatetimeIndex):
+        return data.index
+    if 'timestamp' in data:
+        return data['timestamp'].to_numpy(copy=False)
+    return None
+
+
+if NUMBA_AVAILABLE:
+    # Компилируем ядра при импорте, чтобы первый сигнал не ждал JIT
+    _tail_sums(np.arange(1.0, 21.0))
+    _sma_cross_kernel(1.0, 1.0)
+
+class _SmaState:
+    """Скользящие суммы последних 5 и 20 цен закрытия одного потока свечей"""
+    
+    __slots__ = ('sum5', 'sum20', 'last_idx', 'last_close', 'prev_close', 'updates')
+    
+    # Полный пересчет сумм после стольких обновлений - ограничивает накопление ошибки округления
+    _RESEED_INTERVAL = 1000
+    
+    def __init__(self):
+        """Пустое состояние: первое обновление пересчитывает суммы полностью"""
+        self.sum5 = 0.0
+        self.sum20 = 0.0
+        self.last_idx = None      # Время последней учтенной свечи
+        self.last_close = 0.0     # Цена закрытия последней учтенной свечи
+        self.prev_close = 0.0     # Цена закрытия предпоследней учтенной свечи
+        self.updates = 0          # Инкрементальных обновлений с последнего полного пересчета
+    
+    def update(self, index, close_prices: np.ndarray) -> None:
+        """
+        Обновление скользящих сумм
+        
+        Если данные продолжают ранее обработанные (та же последняя свеча
+        или одна новая свеча), суммы корректируются на изменившиеся цены,
+        иначе пересчитываются полностью.
+        
+        Args:
+            index: Время свечей (см. _bar_times); None - свечи не различимы
+                по времени, суммы пересчитываются полностью
+            close_prices: Цены закрытия
+        """
+        # Без времени свечей новый бар с той же ценой не отличить от текущего
+        last_idx = index[-1] if index is not None else None
+        last_close = close_prices[-1]
+        
+        # NaN/inf в ценах или суммах не вычитается обратно - только полный пересчет
+        if (last_idx is not None and self.last_idx is not None
+                and self.updates < self._RESEED_INTERVAL
+                and math.isfinite(self.sum20) and math.isfinite(last_close)
+                and math.isfinite(close_prices[-2])):
+            if last_idx == self.last_idx and close_prices[-2] == self.prev_close:
+                # Та же свеча - могла измениться только текущая цена закрытия
+                delta = last_close - self.last_close
+                self.sum5 += delta
+                self.sum20 += delta
+                self.last_close = last_close
+                self.updates += 1
+                return
+            
+            if (len(close_prices) > 20 and index[-2] == self.last_idx
+                    and close_prices[-3] == self.prev_close):
+                # Новая свеча: учитываем окончательную цену предыдущей и сдвигаем окна
+                delta = close_prices[-2] - self.last_close
+                sum5 = self.sum5 + delta + last_close - close_prices[-6]
+                sum20 = self.sum20 + delta + last_close - close_prices[-21]
+                # Уходящая из окна цена могла быть NaN - тогда пересчитываем
+                if math.isfinite(sum5) and math.isfinite(sum20):
+                    self.sum5 = sum5
+                    self.sum20 = sum20
+                    self.last_idx = last_idx
+                    self.prev_close = close_prices[-2]
+                    self.last_close = last_close
+                    self.updates += 1
+                    return
+        
+        self.sum5, self.sum20 = _tail_sums(np.ascontiguousarray(close_prices))
+        self.last_idx = last_idx
+        self.prev_close = close_prices[-2]
+        self.last_close = last_close
+        self.updates = 0
+
+
+def _generate_signal(state: _SmaState, data: pd.DataFrame, debug: bool = False) -> Dict[str, Any]:
+    """
+    Сигнал пересечения SMA 5/20 с обновлением скользящих сумм state
+    
+    Без debug возвращается только сигнал и уверенность; результат HOLD -
+    общий неизменяемый по соглашению словарь, его нельзя модифицировать.
+    
+    Args:
+        state: Скользящие суммы потока свечей
+        data: Данные свечей
+        debug: Добавить в результат значения SMA и время расчета
+        
+    Returns:
+        Словарь с сигналом
+    """
+    try:
+        if len(data) < 20:
+            return {'signal': 'HOLD', 'confidence': 0.0, 'reason': 'Недостаточно данных'}
+        
+        # Простая логика генерации сигналов
+        # Для столбца float64 - представление без копирования
+        close_prices = data['close'].to_numpy(dtype=np.float64, copy=False)
+        state.update(_bar_times(data), close_prices)
+        sma_short = state.sum5 / 5
+        sma_long = state.sum20 / 20
+        
+        code, confidence = _sma_cross_kernel(sma_short, sma_long)
+        
+        if not debug:
+            if code == 0:
+                return _HOLD_RESULT
+            return {'signal': _SIGNAL_NAMES[code], 'confidence': confidence}
+        
+        return {
+            'signal': _SIGNAL_NAMES[code],
+            'confidence': confidence,
+            'reason': f'SMA Short: {sma_short:.4f}, SMA Long: {sma_long:.4f}',
+            'timestamp': _fast_now()
+        }
+        
+    except Exception as e:
+        logger.error(f"Ошибка генерации сигнала: {e}")
+        return {'signal': 'HOLD', 'confidence': 0.0, 'reason': f'Ошибка: {e}'}
+
+
 class ScalpSignal:
     """Класс для генерации сигналов скальпинга"""
     
@@ -26,69 +241,94 @@ class ScalpSignal:
         self.timeframe = timeframe
         self.signals = []
         
-    def generate_signal(self, data: pd.DataFrame) -> Dict[str, Any]:
+        # Скользящие суммы для SMA, обновляемые инкрементально между вызовами
+        self._state = _SmaState()
+        
+    def generate_signal(self, data: pd.DataFrame, debug: bool = False) -> Dict[str, Any]:
         """
         Генерация сигнала на основе данных
         
         Args:
             data: Данные свечей
+            debug: Добавить в результат значения SMA и время расчета
             
         Returns:
-            Словарь с сигналом
+            Словарь с сигналом (см. _generate_signal)
         """
-        try:
-            if len(data) < 20:
-                return {'signal': 'HOLD', 'confidence': 0.0, 'reason': 'Недостаточно данных'}
-            
-            # Простая логика генерации сигналов
-            close_prices = data['close'].values
-            sma_short = np.mean(close_prices[-5:])
-            sma_long = np.mean(close_prices[-20:])
-            
-            if sma_short > sma_long * 1.001:
-                signal = 'BUY'
-                confidence = min(0.9, (sma_short - sma_long) / sma_long * 100)
-            elif sma_short < sma_long * 0.999:
-                signal = 'SELL'
-                confidence = min(0.9, (sma_long - sma_short) / sma_long * 100)
-            else:
-                signal = 'HOLD'
-                confidence = 0.0
-            
-            return {
-                'signal': signal,
-                'confidence': confidence,
-                'reason': f'SMA Short: {sma_short:.4f}, SMA Long: {sma_long:.4f}',
-                'timestamp': datetime.now()
-            }
-            
-        except Exception as e:
-            logger.error(f"Ошибка генерации сигнала: {e}")
-            return {'signal': 'HOLD', 'confidence': 0.0, 'reason': f'Ошибка: {e}'}
-
-class AdvancedSignalGenerator:
-    """Продвинутый генератор сигналов"""
+        return _generate_signal(self._state, data, debug)
     
-    def __init__(self):
-        """Инициализация генератора"""
-        self.signal_generators = {}
-        
-    def add_signal_generator(self, symbol: str, timeframe: str = '1m') -> ScalpSignal:
+    def generate_signal_debug(self, data: pd.DataFrame) -> Dict[str, Any]:
         """
-        Добавление генератора сигналов для пары
+        Генерация сигнала с подробным результатом (значения SMA и время расчета)
         
         Args:
-            symbol: Торговая пара
-            timeframe: Таймфрейм
+            data: Данные свечей
             
         Returns:
-            Генератор сигналов
+            Словарь с сигналом
+        """
+        return _generate_signal(self._state, data, True)
+    
+    @staticmethod
+    def generate_signals_series(data: pd.DataFrame,
+                                short_weights: Optional[np.ndarray] = None,
+                                long_weights: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """
+        Сигналы для каждой свечи истории (для бэктеста) за один векторный проход
+        
+        Та же логика пересечения SMA 5/20, что и в generate_signal, но без
+        поштучного вызова на каждую свечу. Свечи без полного окна - HOLD.
+        Вместо простых средних можно задать веса окон (WMA и т.п.); длина
+        весов задает длину окна.
+        
+        Args:
+            data: Данные свечей
+            short_weights: Веса короткого окна (по умолчанию - SMA 5)
+            long_weights: Веса длинного окна (по умолчанию - SMA 20)
+        
+        Returns:
+            DataFrame с колонками signal, confidence, sma5, sma20 и индексом data
         """
-        generator = ScalpSignal(symbol, timeframe)
-        self.signal_generators[f"{symbol}_{timeframe}"] = generator
-        return generator
+        close = data['close'].astype(np.float64)
+        
+        if short_weights is None:
+            sma5 = close.rolling(5, min_periods=5).mean().to_numpy()
+        else:
+            sma5 = _padded_weighted_ma(close.to_numpy(), np.asarray(short_weights, dtype=np.float64))
+        
+        if long_weights is None:
+            sma20 = close.rolling(20, min_periods=20).mean().to_numpy()
+        else:
+            sma20 = _padded_weighted_ma(close.to_numpy(), np.asarray(long_weights, dtype=np.float64))
+        
+        ratio = sma5 / sma20
+        buy = ratio > 1.001
+        sell = ratio < 0.999
+        signal = np.select([buy, sell], ['BUY', 'SELL'], default='HOLD')
+        confidence = np.where(buy | sell, np.minimum(0.9, np.abs(ratio - 1.0) * 100.0), 0.0)
+        
+        return pd.DataFrame({
+            'signal': signal,
+            'confidence': confidence,
+            'sma5': sma5,
+            'sma20': sma20
+        }, index=data.index)
+
+class AdvancedSignalGenerator:
+    """Продвинутый генератор сигналов"""
+    
+    # Максимум пар в кэше результатов get_signal
+    _RESULT_CACHE_SIZE = 512
     
-    def get_signal(self, symbol: str, timeframe: str, data: pd.DataFrame) -> Dict[str, Any]:
+    def __init__(self):
+        """Инициализация генератора"""
+        # Скользящие суммы SMA по ключу "пара_таймфрейм"
+        self._sma_states: Dict[str, _SmaState] = {}
+        # Последний результат по ключу "пара_таймфрейм": ((время и цена последней свечи), сигнал)
+        self._result_cache: OrderedDict = OrderedDict()
+        
+    def get_signal(self, symbol: str, timeframe: str, data: pd.DataFrame,
+                   debug: bool = False) -> Dict[str, Any]:
         """
         Получение сигнала для пары
         
@@ -96,16 +336,37 @@ class AdvancedSignalGenerator:
             symbol: Торговая пара
             timeframe: Таймфрейм
             data: Данные свечей
+            debug: Подробный результат (см. _generate_signal)
             
         Returns:
-            Словарь с сигналом
+            Словарь с сигналом (без debug может быть общим для повторных
+            вызовов на той же свече - не модифицировать)
         """
         key = f"{symbol}_{timeframe}"
         
-        if key not in self.signal_generators:
-            self.add_signal_generator(symbol, timeframe)
+        state = self._sma_states.get(key)
+        if state is None:
+            state = self._sma_states[key] = _SmaState()
         
-        return self.signal_generators[key].generate_signal(data)
+        # Без времени свечей (RangeIndex) новый бар с той же ценой не отличить
+        # от текущего - такой кадр всегда считается заново
+        times = _bar_times(data) if len(data) >= 20 and 'close' in data else None
+        if debug or times is None:
+            return _generate_signal(state, data, debug)
+        
+        # Повторный запрос на той же свече с той же ценой - сигнал не изменился
+        bar_key = (times[-1], data['close'].iat[-1])
+        cached = self._result_cache.get(key)
+        if cached is not None and cached[0] == bar_key:
+            self._result_cache.move_to_end(key)
+            return cached[1]
+        
+        result = _generate_signal(state, data)
+        self._result_cache[key] = (bar_key, result)
+        self._result_cache.move_to_end(key)
+        if len(self._result_cache) > self._RESULT_CACHE_SIZE:
+            self._result_cache.popitem(last=False)
+        return result
     
     def get_all_signals(self, data_dict: Dict[str, pd.DataFrame]) -> Dict[str, Dict[str, Any]]:
         """
@@ -118,16 +379,63 @@ class AdvancedSignalGenerator:
             Словарь со всеми сигналами
         """
         signals = {}
+        symbols = []
+        tails = []
         
+        # Собираем последние 20 цен всех пар в одну матрицу
         for symbol, data in data_dict.items():
             try:
-                signal = self.get_signal(symbol, '1m', data)
-                signals[symbol] = signal
+                if len(data) < 20:
+                    signals[symbol] = {'signal': 'HOLD', 'confidence': 0.0, 'reason': 'Недостаточно данных'}
+                    continue
+                tails.append(data['close'].to_numpy(dtype=np.float64, copy=False)[-20:])
+                symbols.append(symbol)
             except Exception as e:
                 logger.error(f"Ошибка получения сигнала для {symbol}: {e}")
                 signals[symbol] = {'signal': 'HOLD', 'confidence': 0.0, 'reason': f'Ошибка: {e}'}
         
-        return signals
+        if symbols:
+            signals.update(self.get_all_signals_batch(np.stack(tails).astype(np.float32), symbols))
+        
+        # Сохраняем порядок пар из входного словаря
+        return {symbol: signals[symbol] for symbol in data_dict}
+    
+    def get_all_signals_batch(self, close_matrix: np.ndarray, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Расчет сигналов сразу для всех пар
+        
+        Средние считаются в float32: вдвое меньше данных на проход, а 24 бит
+        мантиссы (~7 значащих цифр) с запасом покрывают точность биржевых цен
+        для порогов пересечения 0.1%. В float64 переводится только уверенность.
+        
+        Args:
+            close_matrix: Матрица (количество пар, 20) последних цен закрытия
+            symbols: Торговые пары в порядке строк матрицы
+            
+        Returns:
+            Словарь со всеми сигналами
+        """
+        close_matrix = np.asarray(close_matrix, dtype=np.float32)
+        sma_long = close_matrix.mean(axis=1)
+        sma_short = close_matrix[:, -5:].mean(axis=1)
+        
+        ratio = sma_short / sma_long
+        codes = (ratio > np.float32(1.001)).astype(np.int8) - (ratio < np.float32(0.999)).astype(np.int8)
+        deviation = np.abs(ratio.astype(np.float64) - 1.0)
+        confidence = np.minimum(0.9, deviation * 100.0) * np.abs(codes)
+        
+        timestamp = _fast_now()
+        return {
+            symbol: {
+                'signal': _SIGNAL_NAMES[code],
+                'confidence': conf,
+                'reason': f'SMA Short: {short:.4f}, SMA Long: {long_:.4f}',
+                'timestamp': timestamp
+            }
+            for symbol, code, conf, short, long_ in zip(
+                symbols, codes.tolist(), confidence.tolist(), sma_short.tolist(), sma_long.tolist()
+            )
+        }
 
 
 
@@ -11,13 +11,95 @@ from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from loguru import logger
 
+from ._clock import _fast_now_ns
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    
+    def njit(**kwargs):
+        """Без numba функция выполняется интерпретатором как есть"""
+        return lambda func: func
+
+
+@njit(cache=True)
+def _position_size_kernel(balance, price, risk_pct, sl_pct):
+    """Размер позиции по риску и стоп-лоссу, ограниченный доступным балансом"""
+    # Разница цен считается так же, как раньше, чтобы результат совпадал до бита
+    price_difference = price - price * (1.0 - sl_pct)
+    
+    position_size = 0.0
+    if price_difference > 0:
+        position_size = balance * risk_pct / price_difference
+    
+    # Цена здесь всегда положительна - проверяется вызывающим кодом
+    return min(position_size, balance / price)
+
+
+if NUMBA_AVAILABLE:
+    # Прогрев JIT для float-аргументов
+    _position_size_kernel(1000.0, 50.0, 0.02, 0.01)
+
 class BalanceOptimizer:
     """Оптимизатор баланса для торговых стратегий"""
     
+    # Шаг начального выделения столбцов истории оптимизации
+    _HISTORY_CHUNK = 1024
+    
     def __init__(self):
         """Инициализация оптимизатора"""
-        self.optimization_history = []
+        self._reset_history()
+        
+    def _reset_history(self) -> None:
+        """Создание пустых столбцов истории оптимизации"""
+        self._hist_len = 0
+        # Время Unix в наносекундах: datetime создается только при чтении истории
+        self._hist_ts = np.empty(self._HISTORY_CHUNK, dtype=np.int64)
+        self._hist_total = np.empty(self._HISTORY_CHUNK, dtype=np.float64)
+        self._hist_risk = np.empty(self._HISTORY_CHUNK, dtype=np.float64)
+        # Распределение равномерное: на запись хранится одна сумма на актив
+        self._hist_value = np.empty(self._HISTORY_CHUNK, dtype=np.float64)
+        self._hist_assets: List[Tuple[str, ...]] = []
+    
+    def _append_history(self, timestamp: int, total_balance: float,
+                        risk_per_asset: float, assets: List[str], value: float) -> None:
+        """
+        Добавление записи в историю оптимизации
+        
+        Args:
+            timestamp: Время оптимизации (Unix, наносекунды)
+            total_balance: Общий баланс
+            risk_per_asset: Риск на актив
+            assets: Выбранные активы
+            value: Сумма на каждый актив
+        """
+        i = self._hist_len
+        if i == self._hist_ts.shape[0]:
+            size = i * 2
+            self._hist_ts = np.resize(self._hist_ts, size)
+            self._hist_total = np.resize(self._hist_total, size)
+            self._hist_risk = np.resize(self._hist_risk, size)
+            self._hist_value = np.resize(self._hist_value, size)
         
+        self._hist_ts[i] = timestamp
+        self._hist_total[i] = total_balance
+        self._hist_risk[i] = risk_per_asset
+        self._hist_value[i] = value
+        
+        # Набор активов обычно не меняется между вызовами - храним один кортеж
+        assets = tuple(assets)
+        if self._hist_assets and self._hist_assets[-1] == assets:
+            assets = self._hist_assets[-1]
+        self._hist_assets.append(assets)
+        self._hist_len = i + 1
+    
+    @property
+    def optimization_history(self) -> List[Dict[str, Any]]:
+        """История оптимизации в виде списка записей (только чтение)"""
+        return self.get_optimization_history()
+    
     def optimize_balance_distribution(self, 
                                     total_balance: float,
                                     assets: List[str],
@@ -35,35 +117,33 @@ class BalanceOptimizer:
         Returns:
             Словарь с распределением баланса
         """
-        try:
-            # Ограничиваем количество активов
+        # Ограничиваем количество активов
+        # (срез-копия нужна, только если активов больше лимита)
+        n = len(assets)
+        selected_assets = assets
+        if n > max_assets:
             selected_assets = assets[:max_assets]
-            
-            # Равномерное распределение с учетом риска
-            balance_per_asset = total_balance / len(selected_assets)
-            
-            # Применяем коэффициент риска
-            risk_adjusted_balance = balance_per_asset * (1 - risk_per_asset)
-            
-            distribution = {}
-            for asset in selected_assets:
-                distribution[asset] = risk_adjusted_balance
-            
-            # Сохраняем историю оптимизации
-            self.optimization_history.append({
-                'timestamp': datetime.now(),
-                'total_balance': total_balance,
-                'distribution': distribution.copy(),
-                'risk_per_asset': risk_per_asset
-            })
-            
-            logger.info(f"Баланс оптимизирован: {len(selected_assets)} активов, {risk_per_asset*100}% риск на актив")
-            
-            return distribution
-            
-        except Exception as e:
-            logger.error(f"Ошибка оптимизации баланса: {e}")
+            n = len(selected_assets)
+        
+        if n == 0:
+            logger.warning("Нет активов для распределения баланса")
             return {}
+        
+        # Равномерное распределение с учетом риска
+        balance_per_asset = total_balance / n
+        
+        # Применяем коэффициент риска
+        risk_adjusted_balance = balance_per_asset * (1 - risk_per_asset)
+        
+        distribution = dict.fromkeys(selected_assets, risk_adjusted_balance)
+        
+        # Сохраняем историю оптимизации
+        self._append_history(_fast_now_ns(), total_balance,
+                             risk_per_asset, selected_assets, risk_adjusted_balance)
+        
+        logger.info(f"Баланс оптимизирован: {len(selected_assets)} активов, {risk_per_asset*100}% риск на актив")
+        
+        return distribution
     
     def calculate_optimal_position_size(self, 
                                      balance: float,
@@ -82,30 +162,16 @@ class BalanceOptimizer:
         Returns:
             Оптимальный размер позиции
         """
-        try:
-            # Рассчитываем максимальный риск в долларах
-            max_risk_usd = balance * risk_percentage
-            
-            # Рассчитываем размер позиции на основе стоп-лосса
-            stop_loss_price = asset_price * (1 - stop_loss_percentage)
-            price_difference = asset_price - stop_loss_price
-            
-            if price_difference > 0:
-                position_size = max_risk_usd / price_difference
-            else:
-                position_size = 0
-            
-            # Ограничиваем размер позиции доступным балансом
-            max_position_size = balance / asset_price
-            position_size = min(position_size, max_position_size)
-            
-            logger.debug(f"Оптимальный размер позиции: {position_size:.6f} для цены {asset_price}")
-            
-            return position_size
-            
-        except Exception as e:
-            logger.error(f"Ошибка расчета размера позиции: {e}")
+        if asset_price <= 0 or balance <= 0:
             return 0.0
+        
+        position_size = _position_size_kernel(float(balance), float(asset_price),
+                                              float(risk_percentage), float(stop_loss_percentage))
+        
+        # Аргументы форматируются, только если DEBUG кем-то принимается
+        logger.debug("Оптимальный размер позиции: {:.6f} для цены {}", position_size, asset_price)
+        
+        return position_size
     
     def rebalance_portfolio(self, 
                           current_balances: Dict[str, float],
@@ -122,30 +188,37 @@ class BalanceOptimizer:
         Returns:
             Рекомендации по ребалансировке
         """
-        try:
-            rebalance_actions = {}
-            
-            for asset, target_percentage in target_distribution.items():
-                target_balance = total_balance * target_percentage
-                current_balance = current_balances.get(asset, 0)
-                
-                difference = target_balance - current_balance
-                
-                if abs(difference) > total_balance * 0.01:  # Минимальный порог 1%
-                    rebalance_actions[asset] = {
-                        'current': current_balance,
-                        'target': target_balance,
-                        'difference': difference,
-                        'action': 'BUY' if difference > 0 else 'SELL'
-                    }
-            
-            logger.info(f"Ребалансировка: {len(rebalance_actions)} активов требуют корректировки")
-            
-            return rebalance_actions
-            
-        except Exception as e:
-            logger.error(f"Ошибка ребалансировки: {e}")
+        if not target_distribution:
             return {}
+        
+        assets = list(target_distribution)
+        current_values = [current_balances.get(asset, 0) for asset in assets]
+        
+        # Целевые и текущие балансы всех активов одним массивом
+        targets = np.fromiter(target_distribution.values(), dtype=np.float64,
+                              count=len(assets)) * total_balance
+        currents = np.fromiter(current_values, dtype=np.float64, count=len(assets))
+        differences = targets - currents
+        
+        # Минимальный порог 1%
+        selected = np.flatnonzero(np.abs(differences) > total_balance * 0.01)
+        
+        target_list = targets[selected].tolist()
+        difference_list = differences[selected].tolist()
+        
+        rebalance_actions = {
+            assets[i]: {
+                'current': current_values[i],
+                'target': target,
+                'difference': difference,
+                'action': 'BUY' if difference > 0 else 'SELL'
+            }
+            for i, target, difference in zip(selected.tolist(), target_list, difference_list)
+        }
+        
+        logger.info(f"Ребалансировка: {len(rebalance_actions)} активов требуют корректировки")
+        
+        return rebalance_actions
     
     def get_optimization_history(self) -> List[Dict[str, Any]]:
         """
@@ -154,11 +227,26 @@ class BalanceOptimizer:
         Returns:
             Список записей оптимизации
         """
-        return self.optimization_history.copy()
+        n = self._hist_len
+        timestamps = [datetime.fromtimestamp(ts / 1e9) for ts in self._hist_ts[:n].tolist()]
+        totals = self._hist_total[:n].tolist()
+        risks = self._hist_risk[:n].tolist()
+        values = self._hist_value[:n].tolist()
+        
+        return [
+            {
+                'timestamp': timestamp,
+                'total_balance': total,
+                'distribution': dict.fromkeys(assets, value),
+                'risk_per_asset': risk
+            }
+            for timestamp, total, assets, value, risk
+            in zip(timestamps, totals, self._hist_assets, values, risks)
+        ]
     
     def clear_history(self) -> None:
         """Очистка истории оптимизации"""
-        self.optimization_history.clear()
+        self._reset_history()
         logger.info("История оптимизации очищена")
 
 
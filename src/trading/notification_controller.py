@@ -26,7 +26,7 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 # Импорты существующих модулей
 from core.config_manager import ConfigManager
-from core.security_system_v3 import SecuritySystemV3
+from core.security_system_v3 import get_security_system
 
 class NotificationController:
     """
@@ -48,7 +48,7 @@ class NotificationController:
         self.config = self.config_manager.get_config()
         
         # Система безопасности
-        self.security_system = SecuritySystemV3()
+        self.security_system = get_security_system()
         
         # Telegram бот - только для уведомлений
         self.telegram_token = os.getenv('TELEGRAM_BOT_TOKEN') or os.getenv('TELEGRAM_TOKEN')
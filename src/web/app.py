@@ -18,12 +18,12 @@ sys.path.append(parent_dir)
 sys.path.append(os.path.join(parent_dir, 'enhanced'))
 
 # Импортируем модули системы
-    from core.security_system_v3 import SecuritySystemV3
+    from core.security_system_v3 import get_security_system
 # from trading.bot_manager import BotManager
 from trading.notification_controller import get_notification_controller
 
     # Инициализация системы
-    security_system = SecuritySystemV3()
+    security_system = get_security_system()
 # bot_manager = BotManager()
 notification_controller = get_notification_controller()
 
@@ -372,7 +372,8 @@ def register():
                 secret_key=secret_key,
                 passphrase=passphrase,
                 role=user_role,
-                email=email
+                email=email,
+                password=password
             )
             
             if success:
@@ -830,19 +831,16 @@ def api_balance():
         
         # Получаем API ключи пользователя
         user_creds = security_system.get_user_credentials(user_id)
-        if not user_creds or not user_creds.encrypted_api_key:
+        api_keys = security_system.get_user_api_keys(user_id) if user_creds and user_creds.has_api_keys else None
+        if not api_keys:
             return jsonify({
                 'success': True,
                 'balance': 0,
                 'message': 'API ключи не настроены'
             })
         
-        # Создаем менеджер балансов
-        balance_manager = RealBalanceManager(
-            user_creds.encrypted_api_key,
-            user_creds.encrypted_secret_key,
-            user_creds.encrypted_passphrase
-        )
+        # Создаем менеджер балансов (ключи хранятся зашифрованными - передаем расшифрованные)
+        balance_manager = RealBalanceManager(*api_keys)
         
         # Получаем реальный баланс
         balance_data = balance_manager.get_real_balance()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты Adaptive Balance Manager: LRU-кэш капиталов пользователей
+"""
+
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip('ccxt')
+pytest.importorskip('dotenv')
+
+from src.trading.adaptive_balance_manager import AdaptiveBalanceManager, UserCapital
+
+
+def _capital(user_id, total, grid=0.0, scalp=0.0):
+    return UserCapital(
+        user_id=user_id,
+        total_balance_usd=total,
+        available_balance_usd=total - grid - scalp,
+        reserved_balance_usd=0.0,
+        active_in_grid=grid,
+        active_in_scalp=scalp,
+        currencies={'USDT': total},
+        last_update=time.monotonic(),
+        risk_level='balanced'
+    )
+
+
+@pytest.fixture
+def manager():
+    manager = AdaptiveBalanceManager(exchange=None, config={})
+    manager.max_cached_users = 3
+    return manager
+
+
+def test_store_capital_evicts_least_recently_used(manager):
+    for user_id in range(1, 5):
+        manager._store_capital(_capital(user_id, 100.0 * user_id))
+    
+    assert list(manager.user_capitals) == [2, 3, 4]
+    # Столбцовая копия кэша следует за вытеснением
+    stats = manager.get_system_stats()
+    assert stats['total_users'] == 3
+    assert stats['total_capital_usd'] == 900.0
+    assert sorted(manager._row_of) == [2, 3, 4]
+
+
+def test_users_with_active_allocations_are_not_evicted(manager):
+    manager._store_capital(_capital(1, 100.0, grid=50.0))
+    for user_id in range(2, 5):
+        manager._store_capital(_capital(user_id, 100.0))
+    
+    assert list(manager.user_capitals) == [3, 4, 1]
+    assert manager.get_system_stats()['total_active_usd'] == 50.0
+
+
+def test_cached_capital_hit_refreshes_lru_position(manager):
+    for user_id in range(1, 4):
+        manager._store_capital(_capital(user_id, 100.0))
+    
+    assert asyncio.run(manager.get_user_capital(1)) is manager.user_capitals[1]
+    manager._store_capital(_capital(4, 100.0))
+    
+    assert list(manager.user_capitals) == [3, 1, 4]
+
+
+def test_failed_refresh_keeps_cached_capital(manager):
+    cached = _capital(1, 500.0)
+    manager._store_capital(cached)
+    
+    class BrokenExchange:
+        has = {'fetchTickers': True}
+        
+        async def fetch_balance(self):
+            return {'total': {'USDT': 500.0, 'BTC': 0.01}}
+        
+        async def fetch_tickers(self, symbols):
+            raise KeyError('last')
+    
+    manager.exchange = BrokenExchange()
+    manager._demo_mode = False
+    
+    assert asyncio.run(manager.get_user_capital(1, force_refresh=True)) is cached
+    result = asyncio.run(manager.check_balance_changes(1))
+    assert result['balance_change'] == 0.0
+    assert result['notifications'] == []
+    assert manager.get_system_stats()['total_capital_usd'] == 500.0
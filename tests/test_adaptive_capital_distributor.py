@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты Adaptive Capital Distributor: кэши анализа пар (LRU + TTL), капитала и конфигураций режимов
+"""
+
+import asyncio
+
+import pytest
+
+from src.trading.adaptive_capital_distributor import AdaptiveCapitalDistributor
+
+
+class FakeExchange:
+    """Биржа с фиксированными свечами и счетчиком запросов"""
+    
+    def __init__(self):
+        self.ohlcv_calls = []
+        self.balance_calls = 0
+        self.usdt = 1000.0
+    
+    def fetch_balance(self, params=None):
+        self.balance_calls += 1
+        return {'total': {'USDT': self.usdt}}
+    
+    def fetch_ohlcv(self, symbol, timeframe, limit=4):
+        self.ohlcv_calls.append(symbol)
+        base = 10.0 + len(symbol)
+        return [
+            [i * 3600000, base + i, base + i + 1.0, base + i - 1.0, base + i * 1.1, 1000.0 + i]
+            for i in range(limit)
+        ]
+
+
+@pytest.fixture
+def distributor():
+    return AdaptiveCapitalDistributor(FakeExchange(), user_id=1, config={})
+
+
+def _analyze(distributor, symbols):
+    return asyncio.run(distributor.analyze_trading_pairs(symbols))
+
+
+def test_pair_analysis_served_from_cache_within_ttl(distributor):
+    first = _analyze(distributor, ['BTC/USDT', 'ETH/USDT'])
+    second = _analyze(distributor, ['ETH/USDT', 'BTC/USDT'])
+    
+    assert len(first) == 2
+    assert sorted(distributor.ex.ohlcv_calls) == ['BTC/USDT', 'ETH/USDT']
+    assert {a.symbol for a in second} == {'BTC/USDT', 'ETH/USDT'}
+
+
+def test_expired_pair_analysis_is_refetched(distributor):
+    _analyze(distributor, ['BTC/USDT'])
+    distributor._cache_ttl = 0
+    _analyze(distributor, ['BTC/USDT'])
+    
+    assert distributor.ex.ohlcv_calls == ['BTC/USDT', 'BTC/USDT']
+    assert list(distributor._pair_analysis_cache) == ['BTC/USDT']
+
+
+def test_pair_analysis_cache_evicts_least_recently_used(distributor):
+    distributor._pair_cache_maxsize = 2
+    _analyze(distributor, ['BTC/USDT'])
+    _analyze(distributor, ['ETH/USDT'])
+    # Повторное обращение делает BTC самой свежей записью
+    _analyze(distributor, ['BTC/USDT'])
+    _analyze(distributor, ['SOL/USDT'])
+    
+    assert list(distributor._pair_analysis_cache) == ['BTC/USDT', 'SOL/USDT']
+    
+    _analyze(distributor, ['ETH/USDT'])
+    assert distributor.ex.ohlcv_calls == ['BTC/USDT', 'ETH/USDT', 'SOL/USDT', 'ETH/USDT']
+
+
+def test_total_capital_cached_for_ttl(distributor):
+    assert asyncio.run(distributor.get_total_capital()) == 1000.0
+    distributor.ex.usdt = 2000.0
+    assert asyncio.run(distributor.get_total_capital()) == 1000.0
+    assert distributor.ex.balance_calls == 1
+    
+    # После истечения TTL баланс запрашивается заново
+    distributor._capital_cache_ttl = 0
+    assert asyncio.run(distributor.get_total_capital()) == 2000.0
+    assert distributor.ex.balance_calls == 2
+
+
+def test_mode_config_cached_per_tier_and_conditions(distributor):
+    config = distributor.get_adaptive_mode_config(500.0)
+    
+    # Тот же тир капитала - тот же объект конфигурации
+    assert distributor.get_adaptive_mode_config(700.0) is config
+    assert config['tier'] == 'small'
+    
+    volatile = distributor.get_adaptive_mode_config(500.0, {'high_volatility': True})
+    assert volatile is not config
+    assert volatile['liquidity_threshold'] == config['liquidity_threshold'] * 1.5
+    assert distributor.get_adaptive_mode_config(500.0, {'high_volatility': True}) is volatile
+    
+    # Адаптация к рынку не меняет общую конфигурацию тира
+    assert distributor.get_adaptive_mode_config(500.0) is config
+    assert config == distributor._tier_configs['small']
+
+
+def test_mode_config_cache_is_bounded(distributor):
+    distributor._mode_config_cache_size = 2
+    for i in range(5):
+        distributor.get_adaptive_mode_config(500.0, {'step': i})
+    
+    assert len(distributor._mode_config_cache) <= 2
+
+
+def test_mode_config_with_unhashable_conditions_is_not_cached(distributor):
+    config = distributor.get_adaptive_mode_config(2000.0, {'trending_market': True, 'pairs': ['BTC']})
+    
+    assert config['max_pairs'] == 5
+    assert distributor._mode_config_cache == {}
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты Advanced Signal Generator: инкрементальные суммы SMA и пакетный расчет
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.trading.advanced_signal_generator import AdvancedSignalGenerator, ScalpSignal
+
+
+def _frame(closes):
+    """Свечи с минутным индексом"""
+    return pd.DataFrame({'close': closes},
+                        index=pd.date_range('2024-01-01', periods=len(closes), freq='min'))
+
+
+def _assert_same_signal(result, expected):
+    assert result['signal'] == expected['signal']
+    assert result['confidence'] == pytest.approx(expected['confidence'], abs=1e-9)
+
+
+def test_incremental_sums_match_fresh_generator():
+    rng = np.random.default_rng(0)
+    closes = list(100 + rng.normal(0, 1, 30))
+    generator = ScalpSignal('BTC-USDT')
+    
+    for _ in range(1500):
+        if rng.random() < 0.5:
+            closes.append(100 + rng.normal())
+        else:
+            closes[-1] = 100 + rng.normal()
+        data = _frame(closes)
+        
+        _assert_same_signal(generator.generate_signal(data), ScalpSignal('BTC-USDT').generate_signal(data))
+
+
+def test_nan_close_does_not_poison_incremental_sums():
+    closes = list(np.linspace(100.0, 101.0, 40))
+    generator = ScalpSignal('BTC-USDT')
+    generator.generate_signal(_frame(closes))
+    
+    # Сбой биржи: одна свеча без цены
+    closes.append(float('nan'))
+    assert generator.generate_signal(_frame(closes))['signal'] == 'HOLD'
+    
+    # Устойчивый рост после сбоя
+    for step in range(25):
+        closes.append(102.0 + step)
+        data = _frame(closes)
+        _assert_same_signal(generator.generate_signal(data), ScalpSignal('BTC-USDT').generate_signal(data))
+    
+    assert generator.generate_signal(_frame(closes))['signal'] == 'BUY'
+    assert np.isfinite(generator._state.sum20)
+
+
+def test_nan_in_current_bar_recovers_on_same_bar():
+    closes = list(np.linspace(100.0, 110.0, 30))
+    generator = ScalpSignal('BTC-USDT')
+    generator.generate_signal(_frame(closes))
+    
+    closes[-1] = float('nan')
+    generator.generate_signal(_frame(closes))
+    closes[-1] = 111.0
+    data = _frame(closes)
+    
+    _assert_same_signal(generator.generate_signal(data), ScalpSignal('BTC-USDT').generate_signal(data))
+
+
+def _stream(rng, ticks, window=30):
+    """Окна свечей как из fetch_ohlcv: округленные цены, бар закрывается через тик"""
+    closes = list(np.round(100 + rng.normal(0, 0.3, window).cumsum(), 1))
+    for tick in range(ticks):
+        if tick % 2:
+            closes = closes[1:] + [closes[-1]]
+        else:
+            closes[-1] = round(closes[-1] + rng.choice([-0.1, 0.0, 0.1]), 1)
+        yield list(closes)
+
+
+def test_range_index_frames_recompute_sums():
+    rng = np.random.default_rng(2)
+    generator = ScalpSignal('BTC-USDT')
+    
+    for closes in _stream(rng, 300):
+        # RangeIndex заканчивается тем же значением на каждом тике
+        data = pd.DataFrame({'close': closes})
+        result = generator.generate_signal_debug(data)
+        expected = ScalpSignal('BTC-USDT').generate_signal_debug(data)
+        assert result['reason'] == expected['reason']
+        _assert_same_signal(result, expected)
+
+
+def test_timestamp_column_identifies_bars():
+    rng = np.random.default_rng(3)
+    generator = ScalpSignal('BTC-USDT')
+    start = 0
+    
+    for tick, closes in enumerate(_stream(rng, 300)):
+        start += 60000 * (tick % 2)
+        data = pd.DataFrame({'timestamp': start + 60000 * np.arange(len(closes)), 'close': closes})
+        _assert_same_signal(generator.generate_signal(data), ScalpSignal('BTC-USDT').generate_signal(data))
+    
+    # Суммы обновлялись инкрементально, а не пересчитывались на каждом тике
+    assert generator._state.updates > 0
+
+def test_float32_batch_matches_float64_reference():
+    rng = np.random.default_rng(1)
+    # Цены от 0.001 до 70000 с небольшим трендом в последних свечах
+    base = 10 ** rng.uniform(-3, np.log10(70000), size=(2000, 1))
+    closes = base * (1 + rng.normal(0, 0.002, size=(2000, 20)).cumsum(axis=1))
+    symbols = [f'PAIR{i}-USDT' for i in range(len(closes))]
+    
+    signals = AdvancedSignalGenerator().get_all_signals_batch(closes, symbols)
+    
+    ratio = closes[:, -5:].mean(axis=1) / closes.mean(axis=1)
+    codes = (ratio > 1.001).astype(np.int8) - (ratio < 0.999).astype(np.int8)
+    expected_conf = np.minimum(0.9, np.abs(ratio - 1.0) * 100.0) * np.abs(codes)
+    names = np.array(['SELL', 'HOLD', 'BUY'])[codes + 1]
+    
+    # Пары у самых порогов float32 может честно округлить в другую сторону
+    clear = (np.abs(ratio - 1.001) > 1e-6) & (np.abs(ratio - 0.999) > 1e-6)
+    result_conf = np.array([signals[s]['confidence'] for s in symbols])
+    result_names = np.array([signals[s]['signal'] for s in symbols])
+    
+    assert clear.mean() > 0.99
+    assert (result_names[clear] == names[clear]).all()
+    # Уверенность = 100 * |ratio - 1|: ошибка ratio ~1e-7 усиливается в 100 раз
+    assert np.allclose(result_conf[clear], expected_conf[clear], rtol=1e-5, atol=1e-4)
+    assert result_conf.max() <= 0.9
+
+
+def test_get_signal_reuses_result_for_same_bar():
+    closes = list(np.linspace(100.0, 110.0, 30))
+    generator = AdvancedSignalGenerator()
+    
+    first = generator.get_signal('BTC-USDT', '1m', _frame(closes))
+    assert generator.get_signal('BTC-USDT', '1m', _frame(closes)) is first
+    
+    # Цена текущей свечи изменилась - сигнал пересчитывается
+    closes[-1] = 90.0
+    data = _frame(closes)
+    updated = generator.get_signal('BTC-USDT', '1m', data)
+    assert updated is not first
+    _assert_same_signal(updated, ScalpSignal('BTC-USDT').generate_signal(data))
+
+
+def test_result_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr(AdvancedSignalGenerator, '_RESULT_CACHE_SIZE', 3)
+    generator = AdvancedSignalGenerator()
+    data = _frame(list(np.linspace(100.0, 110.0, 30)))
+    
+    for i in range(5):
+        generator.get_signal(f'PAIR{i}-USDT', '1m', data)
+    
+    assert list(generator._result_cache) == ['PAIR2-USDT_1m', 'PAIR3-USDT_1m', 'PAIR4-USDT_1m']
+
+
+def test_get_signal_does_not_reuse_result_without_bar_time():
+    closes = [100.0] * 30
+    closes[10] = 300.0
+    closes[-1] = 100.2
+    generator = AdvancedSignalGenerator()
+    
+    assert generator.get_signal('BTC-USDT', '1m', pd.DataFrame({'close': closes}))['signal'] == 'SELL'
+    
+    # Новый бар с той же ценой закрытия: выброс 300 ушел из окна
+    data = pd.DataFrame({'close': closes[1:] + [100.2]})
+    result = generator.get_signal('BTC-USDT', '1m', data)
+    
+    _assert_same_signal(result, ScalpSignal('BTC-USDT').generate_signal(data))
+    assert result['signal'] == 'HOLD'
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты Balance Optimizer: столбцовая история оптимизации
+"""
+
+from datetime import datetime
+
+from src.trading.balance_optimizer import BalanceOptimizer
+
+
+def test_history_grows_past_initial_chunk():
+    optimizer = BalanceOptimizer()
+    count = BalanceOptimizer._HISTORY_CHUNK * 2 + 5
+    
+    for i in range(count):
+        assets = ['BTC', 'ETH'] if i % 2 else ['BTC', 'ETH', 'SOL', 'XRP']
+        optimizer.optimize_balance_distribution(1000.0 + i, assets, risk_per_asset=0.01)
+    
+    history = optimizer.get_optimization_history()
+    assert len(history) == count
+    assert history == optimizer.optimization_history
+    
+    for i in (0, BalanceOptimizer._HISTORY_CHUNK, count - 1):
+        record = history[i]
+        n = 2 if i % 2 else 4
+        assert isinstance(record['timestamp'], datetime)
+        assert record['total_balance'] == 1000.0 + i
+        assert record['risk_per_asset'] == 0.01
+        assert record['distribution'] == dict.fromkeys(
+            ['BTC', 'ETH', 'SOL', 'XRP'][:n], (1000.0 + i) / n * 0.99)
+
+
+def test_history_record_matches_returned_distribution():
+    optimizer = BalanceOptimizer()
+    assets = ['BTC', 'ETH', 'SOL']
+    
+    distribution = optimizer.optimize_balance_distribution(900.0, assets, max_assets=2)
+    assets.append('XRP')
+    
+    record, = optimizer.get_optimization_history()
+    assert record['distribution'] == distribution == {'BTC': 441.0, 'ETH': 441.0}
+    
+    # Записи истории - копии, изменение не влияет на оптимизатор
+    record['distribution']['BTC'] = 0.0
+    assert optimizer.get_optimization_history()[0]['distribution']['BTC'] == 441.0
+
+
+def test_history_keeps_assets_when_caller_list_changes():
+    optimizer = BalanceOptimizer()
+    assets = ['BTC', 'ETH']
+    
+    optimizer.optimize_balance_distribution(100.0, assets)
+    assets.append('SOL')
+    
+    record, = optimizer.get_optimization_history()
+    assert list(record['distribution']) == ['BTC', 'ETH']
+
+
+def test_clear_history_resets_columns():
+    optimizer = BalanceOptimizer()
+    for _ in range(BalanceOptimizer._HISTORY_CHUNK + 1):
+        optimizer.optimize_balance_distribution(100.0, ['BTC'])
+    
+    optimizer.clear_history()
+    assert optimizer.get_optimization_history() == []
+    
+    optimizer.optimize_balance_distribution(200.0, ['ETH'])
+    record, = optimizer.get_optimization_history()
+    assert record['total_balance'] == 200.0
+    assert record['distribution'] == {'ETH': 196.0}
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты хеширования и проверки паролей SecurityManager
+"""
+
+import hashlib
+import secrets
+
+import pytest
+
+from src.core import security
+from src.core.security import SecurityManager
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    # Мастер-ключ не пишем в config/ репозитория
+    monkeypatch.setattr(SecurityManager, '_load_or_generate_master_key',
+                        lambda self: b'0' * 32)
+    monkeypatch.setattr(SecurityManager, '_create_fernet', lambda self: None)
+    security._VERIFIED_CACHE.clear()
+    yield SecurityManager()
+    security._VERIFIED_CACHE.clear()
+
+
+def test_scrypt_hash_roundtrip(manager):
+    password_hash = manager.hash_password('s3cret')
+    
+    assert password_hash.startswith('scrypt$')
+    assert manager.verify_password('s3cret', password_hash)
+    assert not manager.verify_password('wrong', password_hash)
+
+
+def test_legacy_pbkdf2_hash_still_verifies(manager):
+    salt = secrets.token_hex(16)
+    digest = hashlib.pbkdf2_hmac('sha256', b's3cret', salt.encode('utf-8'), 100000)
+    password_hash = f"{salt}:{digest.hex()}"
+    
+    assert manager.verify_password('s3cret', password_hash)
+    assert not manager.verify_password('wrong', password_hash)
+
+
+def test_hash_password_does_not_fill_cache(manager):
+    for _ in range(3):
+        manager.hash_password('s3cret')
+    
+    assert len(security._VERIFIED_CACHE) == 0
+
+
+def test_cache_keeps_only_successful_checks_without_plaintext(manager):
+    password_hash = manager.hash_password('s3cret')
+    
+    assert not manager.verify_password('wrong', password_hash)
+    assert len(security._VERIFIED_CACHE) == 0
+    
+    assert manager.verify_password('s3cret', password_hash)
+    assert manager.verify_password('s3cret', password_hash)
+    assert len(security._VERIFIED_CACHE) == 1
+    
+    (stored_hash, digest), = security._VERIFIED_CACHE
+    assert stored_hash == password_hash
+    assert b's3cret' not in digest
+    assert digest != b's3cret'
+
+
+def test_cached_check_is_bound_to_stored_hash(manager):
+    first = manager.hash_password('s3cret')
+    other = manager.hash_password('other')
+    
+    assert manager.verify_password('s3cret', first)
+    assert not manager.verify_password('s3cret', other)
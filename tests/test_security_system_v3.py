@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Тесты Security System v3.0: хранение API ключей, пароли, фоновая запись логов
+"""
+
+import gc
+import sqlite3
+
+import pytest
+from cryptography.fernet import Fernet
+
+from src.core.security_system_v3 import SecuritySystemV3
+
+API_KEY = 'a' * 32
+SECRET_KEY = 's' * 40
+PASSPHRASE = 'Passphrase#1'
+
+
+@pytest.fixture
+def security(tmp_path, monkeypatch):
+    """Система безопасности на временной базе с собственным мастер-ключом"""
+    monkeypatch.setenv('MASTER_ENCRYPTION_KEY', Fernet.generate_key().decode())
+    system = SecuritySystemV3(db_path=str(tmp_path / 'secure_users.db'))
+    yield system
+    system.close()
+
+
+def test_register_roundtrip_blob(security):
+    assert security.register_user(1001, 'alice', API_KEY, SECRET_KEY, PASSPHRASE)
+    
+    user_creds = security.get_user_credentials(1001)
+    assert user_creds.encrypted_blob
+    assert user_creds.has_api_keys
+    assert security.get_user_api_keys(1001) == (API_KEY, SECRET_KEY, PASSPHRASE)
+
+
+def test_update_api_keys_roundtrip(security):
+    assert security.register_user(1002, 'bob', API_KEY, SECRET_KEY, PASSPHRASE)
+    new_keys = ('b' * 30, 't' * 30, 'ключ-юникод')
+    
+    assert security.update_user_api_keys(1002, *new_keys)
+    assert security.get_user_credentials(1002).has_api_keys
+    assert security.get_user_api_keys(1002) == new_keys
+    assert security.decrypt_all([1002, 9999]) == {1002: new_keys, 9999: None}
+
+
+def test_legacy_per_field_rows_still_decrypt(security):
+    enc_api, enc_secret, enc_passphrase, enc_user_key = security.encrypt_api_credentials(
+        API_KEY, SECRET_KEY, PASSPHRASE)
+    with security._conn() as conn:
+        conn.execute('''
+            INSERT INTO secure_users
+            (user_id, telegram_username, encrypted_api_key, encrypted_secret_key,
+             encrypted_passphrase, encryption_key)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (1003, 'legacy', enc_api, enc_secret, enc_passphrase, enc_user_key))
+    
+    user_creds = security.get_user_credentials(1003)
+    assert user_creds.encrypted_blob is None
+    assert user_creds.has_api_keys
+    assert security.get_user_api_keys(1003) == (API_KEY, SECRET_KEY, PASSPHRASE)
+
+
+def test_authenticate_user_decrypts_blob(security):
+    assert security.register_user(1004, 'carol', API_KEY, SECRET_KEY, PASSPHRASE)
+    
+    session_id = security.authenticate_user(1004)
+    assert session_id
+    assert security.validate_session(session_id) == 1004
+
+
+def test_password_login_uses_bcrypt_hash(security):
+    assert security.register_user(2001, 'dave', API_KEY, SECRET_KEY, PASSPHRASE, password='s3cret-pass')
+    
+    password_hash = security.get_user_credentials(2001).password_hash
+    assert password_hash.startswith('$2')
+    assert 's3cret-pass' not in password_hash
+    assert security.verify_password(2001, 's3cret-pass')
+    assert not security.verify_password(2001, 'wrong-pass')
+
+
+def test_account_without_password_cannot_be_claimed(security):
+    # Регистрация из Telegram/админки: пароль не задан
+    assert security.register_user(2002, 'erin', API_KEY, SECRET_KEY, PASSPHRASE)
+    
+    for guess in ('123', '123456', 'password', 'admin', PASSPHRASE, ''):
+        assert not security.verify_password(2002, guess)
+    assert security.get_user_credentials(2002).password_hash is None
+    
+    # Пароль задается только явно
+    assert security.update_user_password(2002, 'owner-pass')
+    assert security.verify_password(2002, 'owner-pass')
+    assert not security.verify_password(2002, '123')
+
+
+def test_verify_password_unknown_user(security):
+    assert not security.verify_password(424242, 'anything')
+
+
+def test_close_stops_log_writer_and_flushes(security):
+    security.log_security_event(3001, 'test_event', '', '', True, {'k': 1})
+    security.close()
+    
+    assert not security._log_thread.is_alive()
+    with security._conn() as conn:
+        rows = conn.execute("SELECT details FROM security_logs WHERE action = 'test_event'").fetchall()
+    assert [row['details'] for row in rows] == ['{"k":1}']
+    
+    # Повторный вызов безопасен
+    security.close()
+
+
+def test_unreferenced_instance_releases_log_writer(tmp_path, monkeypatch):
+    monkeypatch.setenv('MASTER_ENCRYPTION_KEY', Fernet.generate_key().decode())
+    system = SecuritySystemV3(db_path=str(tmp_path / 'secure_users.db'))
+    thread = system._log_thread
+    
+    # Поток просыпается раз в секунду и видит, что экземпляра больше нет
+    del system
+    gc.collect()
+    thread.join(timeout=3)
+    assert not thread.is_alive()
+
+
+def test_changes_from_another_process_bypass_caches(security, tmp_path):
+    # Второй экземпляр на той же базе - как скрипт или другой воркер
+    other = SecuritySystemV3(db_path=security.db_path)
+    try:
+        assert security.register_user(4001, 'frank', API_KEY, SECRET_KEY, PASSPHRASE)
+        assert security.get_user_credentials(4001).is_active
+        assert not security.is_admin(4001)
+        assert security.get_user_api_keys(4001) == (API_KEY, SECRET_KEY, PASSPHRASE)
+        
+        assert other.deactivate_user(4001)
+        assert other.update_user_role(4001, 'admin')
+        new_keys = ('c' * 30, 'u' * 30, 'rotated')
+        assert other.update_user_api_keys(4001, *new_keys)
+        
+        assert not security.get_user_credentials(4001).is_active
+        assert security.is_admin(4001)
+        assert security.get_user_api_keys(4001) == new_keys
+        assert security.authenticate_user(4001) is None
+    finally:
+        other.close()
+
+
+def test_admin_demoted_elsewhere_loses_access_immediately(security):
+    other = SecuritySystemV3(db_path=security.db_path)
+    try:
+        assert security.register_user(4003, 'heidi', API_KEY, SECRET_KEY, PASSPHRASE, role='admin')
+        assert security.is_admin(4003)
+        assert security.can_access_telegram(4003)
+        
+        assert other.update_user_role(4003, 'user')
+        
+        assert not security.is_admin(4003)
+        assert not security.can_access_telegram(4003)
+    finally:
+        other.close()
+
+
+def test_raw_sql_update_invalidates_cached_credentials(security):
+    assert security.register_user(4002, 'grace', API_KEY, SECRET_KEY, PASSPHRASE)
+    assert security.get_user_credentials(4002).is_active
+    
+    conn = sqlite3.connect(security.db_path)
+    with conn:
+        conn.execute('UPDATE secure_users SET is_active = 0 WHERE user_id = ?', (4002,))
+    conn.close()
+    
+    assert not security.get_user_credentials(4002).is_active
+
+
+def test_failed_migration_rolls_back_schema_changes(tmp_path, monkeypatch):
+    monkeypatch.setenv('MASTER_ENCRYPTION_KEY', Fernet.generate_key().decode())
+    db_path = str(tmp_path / 'old.db')
+    
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute('''
+            CREATE TABLE secure_users (
+                user_id INTEGER PRIMARY KEY,
+                telegram_username TEXT UNIQUE NOT NULL,
+                encrypted_api_key TEXT NOT NULL,
+                encrypted_secret_key TEXT NOT NULL,
+                encrypted_passphrase TEXT NOT NULL,
+                encryption_key TEXT NOT NULL,
+                registration_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_login TIMESTAMP,
+                login_attempts INTEGER DEFAULT 0,
+                is_active BOOLEAN DEFAULT 1,
+                role TEXT DEFAULT 'user'
+            )
+        ''')
+        # Сводку нельзя пополнить - миграция падает после ALTER TABLE
+        conn.execute('CREATE VIEW security_log_hourly AS SELECT 1 AS action WHERE 0')
+    conn.close()
+    
+    with pytest.raises(sqlite3.Error):
+        SecuritySystemV3(db_path=db_path)
+    
+    conn = sqlite3.connect(db_path)
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(secure_users)')}
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    conn.close()
+    
+    assert 'row_version' not in columns and 'encrypted_blob' not in columns
+    assert 'trg_secure_users_version' not in tables
+    assert 'login_sessions' not in tables